@@ -32,3 +32,17 @@ def get_input_filepaths(input_dir_path, acceptable_exts=None):
                 if dirpath.endswith('/'):
                     dirpath = dirpath[:-1]
                 yield f"{dirpath}/{filename}"
+
+
+def get_latest_output_path(dir_path, prefix):
+    """
+    Returns the path of the most recently modified file or directory in `dir_path` whose name
+     starts with `prefix`, e.g., `hyp_textgrids_`, or None if there isn't one.
+    """
+    output_paths = [
+        f"{dir_path}/{filename}" for filename in os.listdir(dir_path)
+        if filename.startswith(prefix)
+    ]
+    if not output_paths:
+        return None
+    return max(output_paths, key=os.path.getmtime)
@@ -0,0 +1,25 @@
+import click as click
+
+from error_analysis.analyzer import analyzer_main
+from error_analysis.lexical_index import query_main
+from error_analysis.marker_updater import marker_updater_main
+from error_analysis.merger import merger_main
+from error_analysis.rules_linter import lint_rules_main
+from error_analysis.validator import validator_main
+
+
+@click.group()
+def cli():
+    """Set of CLI utilities for analyzing errors and phonetic markers."""
+
+
+cli.add_command(analyzer_main, name='analyze')
+cli.add_command(lint_rules_main, name='lint-rules')
+cli.add_command(validator_main, name='validate')
+cli.add_command(merger_main, name='merge')
+cli.add_command(query_main, name='query')
+cli.add_command(marker_updater_main, name='update-markers')
+
+
+if __name__ == '__main__':
+    cli()
@@ -1,4 +1,6 @@
+import hashlib
 import os
+import pickle
 import re
 import sys
 import textwrap
@@ -15,11 +17,17 @@ from praatio.utilities.constants import Interval
 from tqdm import tqdm
 
 from common_main_methods import get_input_filepaths, std_out_err_redirect_tqdm
+from error_analysis.lexical_index import build_lexical_index
 from phonemic import get_phonemic_reprs, arpabet_to_ipa, ARPABET_TO_IPA, get_phone_dict
 
 SILENCE_MARKERS_WORDS = frozenset(['{SL}', 'sp', '{LG}', '{BR}'])
 SILENCE_MARKERS_PHONES = frozenset(['sp', 'sil'])
 
+# per-token results of a single rule entry, in increasing order of how much of it matched
+RULE_ENTRY_UNMATCHED, RULE_ENTRY_POSSIBLE, RULE_ENTRY_MATCHED = 0, 1, 2
+MARKER_CACHE_FILENAME = '.marker_cache.pickle'
+MARKER_CACHE_VERSION = 1
+
 
 @click.command()
 @click.option(
@@ -81,12 +89,17 @@ SILENCE_MARKERS_PHONES = frozenset(['sp', 'sil'])
 )
 @click.option(
     '--rules-input-path',
-    prompt='Enter the filepath of the YAML-formatted regexp rules used to identify phonetic'
-           ' markers\n',
+    prompt='Enter the filepath(s) of the YAML-formatted regexp rules used to identify phonetic'
+           ' markers, separated by commas\n',
     help=textwrap.dedent(
         '''\
         The filepath of the YAML-formatted regexp rules used to identify phonetic markers.
         See example under marker_rules/mkscott_thesis_rules.yaml
+
+        Several comma-separated filepaths may be given to compare versions of the rules in one
+         pass. Each rules file gets its own `markers-{rules file name}` and
+         `poss-markers-{rules file name}` tiers, and the number of tokens whose markers differ
+         from the first rules file is written to `marker_summary_{datetime}.yaml`.
         \n
         '''
     )
@@ -110,9 +123,22 @@ SILENCE_MARKERS_PHONES = frozenset(['sp', 'sil'])
         '''
     )
 )
+@click.option(
+    '--shard', default=None, callback=lambda ctx, param, value: parse_shard(value),
+    help=textwrap.dedent(
+        '''\
+        Only process the speaker-tasks in shard `i` of `N`, given as `i/N` with 0 <= i < N, e.g.,
+         `0/4`. Speaker-tasks are assigned to shards by a stable hash of their identifiers, so
+         each shard can be run on a different machine into its own output directory, and the
+         shard output directories can then be combined with the `merge` command. Each output
+         directory gets a `shard_manifest_{datetime}.yaml` that `merge` checks the shards against.
+        \n
+        '''
+    )
+)
 def analyzer_main(
         pra_inputs_dir_path, textgrid_inputs_dir_path, wav_inputs_dir_path, rules_input_path,
-        pronunciation_dict_path, output_dir_path
+        pronunciation_dict_path, output_dir_path, shard
 ):
     """
     Analysis program that takes input Praat TextGrids of transcribed speech, sclite diff outputs
@@ -123,23 +149,73 @@ def analyzer_main(
     phone_dict = get_phone_dict(pronunciation_dict_path)
 
     symlink_root = make_input_symlinks(
-        pra_inputs_dir_path, textgrid_inputs_dir_path, wav_inputs_dir_path, output_dir_path
+        pra_inputs_dir_path, textgrid_inputs_dir_path, wav_inputs_dir_path, output_dir_path, shard
     )
 
     aligned_error_dict = {}
     datetime_str = datetime.now().strftime('%d_%b_%y_%H-%M-%S%Z')
+    rules_filepaths = split_rules_input_path(rules_input_path)
+    write_shard_manifest(
+        get_shard_manifest(shard, rules_filepaths, pronunciation_dict_path), output_dir_path,
+        datetime_str
+    )
     dirpath, dirnames, filenames = next(os.walk(symlink_root))
     with std_out_err_redirect_tqdm() as orig_stdout:
         print("Aligning sclite error outputs with TextGrids...")
-        for dirname in tqdm(dirnames, file=orig_stdout, dynamic_ncols=True):
+        # sorted so that outputs don't depend on directory order, which differs between machines
+        for dirname in tqdm(sorted(dirnames), file=orig_stdout, dynamic_ncols=True):
             aligned_error_dict |= get_all_errors(f"{dirpath}/{dirname}", datetime_str)
+    write_aligned_errors(aligned_error_dict, output_dir_path, datetime_str)
 
     hyp_textgrids_dirpath = f"{output_dir_path}/hyp_textgrids_{datetime_str}"
-    find_and_add_marker_candidates(hyp_textgrids_dirpath, rules_input_path, phone_dict)
+    marker_summary = find_and_add_marker_candidates(
+        hyp_textgrids_dirpath, rules_filepaths, phone_dict
+    )
+    write_marker_summary(marker_summary, output_dir_path, datetime_str)
+
+    print("Building lexical index...")
+    lexical_index = build_lexical_index(aligned_error_dict, hyp_textgrids_dirpath)
+    lexical_index.save(f"{output_dir_path}/lexical_index_{datetime_str}.bin")
+
+
+def split_rules_input_path(rules_input_path):
+    return [
+        rules_filepath.strip() for rules_filepath in rules_input_path.split(',')
+        if rules_filepath.strip()
+    ]
 
 
-def make_input_symlinks(pra_dir, textgrid_dir, wav_dir, output_dir_path):
+def make_input_symlinks(pra_dir, textgrid_dir, wav_dir, output_dir_path, shard=None):
     symlink_output_root = f"{output_dir_path}/symlinks"
+    filepath_dict = group_input_filepaths(pra_dir, textgrid_dir, wav_dir)
+    # a shard may have no speaker-tasks, but later steps still expect the directory to exist
+    os.makedirs(symlink_output_root, exist_ok=True)
+
+    for spkr_task_id, filepaths in filepath_dict.items():
+        if shard is not None and get_shard_index(spkr_task_id, shard[1]) != shard[0]:
+            continue
+        spkr_task_output_dir = f"{symlink_output_root}/{spkr_task_id}"
+        try:
+            os.makedirs(spkr_task_output_dir)
+        except FileExistsError:
+            pass
+
+        for filepath in filepaths:
+            path = Path(filepath)
+            filename, ext = path.name, path.suffix
+            new_filename = spkr_task_id
+            if ext == '.pra':
+                system = filename.split('_', maxsplit=1)[0]
+                new_filename = f"{system}-{new_filename}"
+            try:
+                os.symlink(filepath, f"{spkr_task_output_dir}/{new_filename}{ext}")
+            except FileExistsError:
+                pass  # assumption is that if the file already exists, it's the one you want
+
+    return symlink_output_root
+
+
+def group_input_filepaths(pra_dir, textgrid_dir, wav_dir):
     pra_filepaths = get_input_filepaths(pra_dir, ['pra'])
     textgrid_filepaths = get_input_filepaths(textgrid_dir, ['textgrid'])
     wav_filepaths = get_input_filepaths(wav_dir, ['wav'])
@@ -165,26 +241,64 @@ def make_input_symlinks(pra_dir, textgrid_dir, wav_dir, output_dir_path):
         spkr_task_id = spkr_task_id.split('.')[0]
         filepath_dict[spkr_task_id].add(filepath)
 
-    for spkr_task_id, filepaths in filepath_dict.items():
-        spkr_task_output_dir = f"{symlink_output_root}/{spkr_task_id}"
-        try:
-            os.makedirs(spkr_task_output_dir)
-        except FileExistsError:
-            pass
+    return filepath_dict
 
-        for filepath in filepaths:
-            path = Path(filepath)
-            filename, ext = path.name, path.suffix
-            new_filename = spkr_task_id
-            if ext == '.pra':
-                system = filename.split('_', maxsplit=1)[0]
-                new_filename = f"{system}-{new_filename}"
-            try:
-                os.symlink(filepath, f"{spkr_task_output_dir}/{new_filename}{ext}")
-            except FileExistsError:
-                pass  # assumption is that if the file already exists, it's the one you want
 
-    return symlink_output_root
+def parse_shard(shard_str):
+    if shard_str is None:
+        return None
+    shard_match = re.match(r"^(\d+)/(\d+)$", shard_str.strip())
+    if not shard_match:
+        raise click.BadParameter(f"Expected a shard formatted as `i/N`, but got {shard_str}")
+    shard_index, num_shards = int(shard_match.group(1)), int(shard_match.group(2))
+    if not 0 <= shard_index < num_shards:
+        raise click.BadParameter(
+            f"Expected a shard index between 0 and {num_shards - 1}, but got {shard_index}"
+        )
+    return shard_index, num_shards
+
+
+def get_shard_manifest(shard, rules_filepaths, pronunciation_dict_path):
+    """
+    Returns which shard of the speaker-tasks an output directory holds, along with what they were
+     analyzed with, so that the `merge` command can check that the shards it's given belong
+     together. Runs without `--shard` are shard `0/1`.
+    """
+    shard_index, num_shards = shard or (0, 1)
+    return {
+        'shard': shard_index,
+        'num_shards': num_shards,
+        'rules_files': [Path(rules_filepath).name for rules_filepath in rules_filepaths],
+        'rules_fingerprint': _get_files_fingerprint(rules_filepaths),
+        'pronunciation_dict': (
+            Path(pronunciation_dict_path).name if pronunciation_dict_path else None
+        ),
+        'pronunciation_dict_fingerprint': (
+            _get_files_fingerprint([pronunciation_dict_path]) if pronunciation_dict_path else None
+        )
+    }
+
+
+def _get_files_fingerprint(filepaths):
+    # only the contents are hashed, since shards may be run from different directories
+    sha1 = hashlib.sha1()
+    for filepath in filepaths:
+        with open(filepath, 'rb') as file:
+            sha1.update(hashlib.sha1(file.read()).digest())
+    return sha1.hexdigest()
+
+
+def write_shard_manifest(shard_manifest, output_dir_path, datetime_str):
+    shard_manifest_filepath = f"{output_dir_path}/shard_manifest_{datetime_str}.yaml"
+    with open(shard_manifest_filepath, 'w') as shard_manifest_file:
+        yaml.safe_dump(shard_manifest, shard_manifest_file, allow_unicode=True, sort_keys=False)
+    return shard_manifest_filepath
+
+
+def get_shard_index(spkr_task_id, num_shards):
+    # python's hash() is salted per process, so it can't be used to agree across machines
+    digest = hashlib.sha1(spkr_task_id.encode('utf-8')).hexdigest()
+    return int(digest, 16) % num_shards
 
 
 def get_all_errors(input_spkr_dir, datetime_str):
@@ -193,48 +307,12 @@ def get_all_errors(input_spkr_dir, datetime_str):
     wav_filepath = _get_and_assert_one_file(input_spkr_dir, 'wav')
     tg_filepath = _get_and_assert_one_file(input_spkr_dir, 'textgrid')
     error_counts = Counter()
-    for input_filepath in get_input_filepaths(input_spkr_dir, ['pra']):
+    # sorted so that the `{system}-hyp` tiers are always added in the same order
+    for input_filepath in sorted(get_input_filepaths(input_spkr_dir, ['pra'])):
         system = input_filepath.rsplit('/', maxsplit=1)[-1].rsplit('-', maxsplit=1)[0]
-
-        with open(input_filepath, 'r') as input_file:
-            lines_to_eval = []
-            for line in input_file.readlines():
-                if re.match(r"^(?:>> )?(?:REF|HYP).*$", line):
-                    lines_to_eval.append(line)
-            # create pairs of ref & hyp
-            lines_to_eval = zip(*[iter(lines_to_eval)]*2)
-
-            aligned_pairs = []
-            for ref_line, hyp_line in lines_to_eval:
-                ref_words = re.sub(r"(?:>> )?REF:", '', ref_line).split()
-                hyp_words = re.sub(r"(?:>> )?HYP:", '', hyp_line).split()
-                aligned_pairs.extend(list(zip(ref_words, hyp_words)))
-
-            error_objs = []
-            for idx, aligned_pair in enumerate(aligned_pairs):
-                ref_word, hyp_word = aligned_pair
-                error_obj = {
-                    'ref': ref_word, 'hyp': hyp_word, 'index': idx
-                }
-                if re.match(r"^\*+$", ref_word):
-                    # Insertion
-                    error_obj['error'] = 'ins'
-                    error_counts['ins'] += 1
-                elif re.match(r"^\*+$", hyp_word):
-                    # Deletion
-                    error_obj['error'] = 'del'
-                    error_counts['del'] += 1
-                elif ref_word.isupper and hyp_word.isupper():
-                    # Substitution
-                    error_obj['error'] = 'sub'
-                    error_counts['sub'] += 1
-                else:
-                    # Correct
-                    error_obj['error'] = 'corr'
-                error_objs.append(error_obj)
-
-            error_objs = _add_alignments(error_objs, tg_filepath, system, datetime_str)
-            systems_to_err_objs[system] = error_objs
+        error_objs = get_error_objs(input_filepath, error_counts)
+        error_objs = _add_alignments(error_objs, tg_filepath, system, datetime_str)
+        systems_to_err_objs[system] = error_objs
     return {
         spkr_tsk_id: {
             'wav': wav_filepath, 'textgrid': tg_filepath,
@@ -244,6 +322,49 @@ def get_all_errors(input_spkr_dir, datetime_str):
     }
 
 
+def get_error_objs(pra_filepath, error_counts=None):
+    if error_counts is None:
+        error_counts = Counter()
+
+    with open(pra_filepath, 'r') as input_file:
+        lines_to_eval = []
+        for line in input_file.readlines():
+            if re.match(r"^(?:>> )?(?:REF|HYP).*$", line):
+                lines_to_eval.append(line)
+        # create pairs of ref & hyp
+        lines_to_eval = zip(*[iter(lines_to_eval)]*2)
+
+        aligned_pairs = []
+        for ref_line, hyp_line in lines_to_eval:
+            ref_words = re.sub(r"(?:>> )?REF:", '', ref_line).split()
+            hyp_words = re.sub(r"(?:>> )?HYP:", '', hyp_line).split()
+            aligned_pairs.extend(list(zip(ref_words, hyp_words)))
+
+        error_objs = []
+        for idx, aligned_pair in enumerate(aligned_pairs):
+            ref_word, hyp_word = aligned_pair
+            error_obj = {
+                'ref': ref_word, 'hyp': hyp_word, 'index': idx
+            }
+            if re.match(r"^\*+$", ref_word):
+                # Insertion
+                error_obj['error'] = 'ins'
+                error_counts['ins'] += 1
+            elif re.match(r"^\*+$", hyp_word):
+                # Deletion
+                error_obj['error'] = 'del'
+                error_counts['del'] += 1
+            elif ref_word.isupper and hyp_word.isupper():
+                # Substitution
+                error_obj['error'] = 'sub'
+                error_counts['sub'] += 1
+            else:
+                # Correct
+                error_obj['error'] = 'corr'
+            error_objs.append(error_obj)
+    return error_objs
+
+
 def _get_and_assert_one_file(dir_path, ext):
     filepaths = list(get_input_filepaths(dir_path, [ext]))
     if len(filepaths) > 1:
@@ -256,37 +377,8 @@ def _get_and_assert_one_file(dir_path, ext):
 
 def _add_alignments(error_objs, tg_filepath, system, datetime_str):
     textgrid_obj = textgrid.openTextgrid(tg_filepath, includeEmptyIntervals=True)
-    filtered_tg_intervals = []
-    for interval in textgrid_obj.getTier('word').entries:
-        word = interval.label
-        # TODO configure words to ignore in textgrid
-        if not word or word in SILENCE_MARKERS_WORDS:
-            continue
-        filtered_tg_intervals.append(interval)
-
-    # combined means that ins-errors were combined into other adjacent errors
-    combined_err_objs = []
-    ins_err_seq = []
-    last_non_ins_err_obj = None
-    for error_obj in error_objs:
-        combined_err_obj = error_obj.copy()
-        if error_obj['error'] == 'ins':
-            ins_err_seq.append(combined_err_obj['hyp'].upper())
-            continue
-        elif len(ins_err_seq) > 0:
-            hyp_word = combined_err_obj['hyp']
-            hyp_word = hyp_word.lower() if combined_err_obj['error'] == 'corr' else hyp_word.upper()
-            combined_err_obj['hyp'] = f"ins: [{' '.join(ins_err_seq)}] {hyp_word}"
-            ins_err_seq = []
-        else:
-            last_non_ins_err_obj = combined_err_obj
-        combined_err_objs.append(combined_err_obj)
-
-    # if the last sequence is all ins-errors, then we have some leftover we need to deal with
-    if len(ins_err_seq) > 0:
-        hyp_word = last_non_ins_err_obj['hyp']
-        hyp_word = hyp_word.lower() if last_non_ins_err_obj['error'] == 'corr' else hyp_word.upper()
-        last_non_ins_err_obj['hyp'] = f"{hyp_word} ins: [{' '.join(ins_err_seq)}]"
+    filtered_tg_intervals = get_filtered_word_intervals(textgrid_obj)
+    combined_err_objs = combine_ins_errors(error_objs)
 
     if len(filtered_tg_intervals) != len(combined_err_objs):
         print(
@@ -369,6 +461,44 @@ def _add_alignments(error_objs, tg_filepath, system, datetime_str):
     return new_error_objs
 
 
+def get_filtered_word_intervals(textgrid_obj):
+    filtered_tg_intervals = []
+    for interval in textgrid_obj.getTier('word').entries:
+        word = interval.label
+        # TODO configure words to ignore in textgrid
+        if not word or word in SILENCE_MARKERS_WORDS:
+            continue
+        filtered_tg_intervals.append(interval)
+    return filtered_tg_intervals
+
+
+def combine_ins_errors(error_objs):
+    # combined means that ins-errors were combined into other adjacent errors
+    combined_err_objs = []
+    ins_err_seq = []
+    last_non_ins_err_obj = None
+    for error_obj in error_objs:
+        combined_err_obj = error_obj.copy()
+        if error_obj['error'] == 'ins':
+            ins_err_seq.append(combined_err_obj['hyp'].upper())
+            continue
+        elif len(ins_err_seq) > 0:
+            hyp_word = combined_err_obj['hyp']
+            hyp_word = hyp_word.lower() if combined_err_obj['error'] == 'corr' else hyp_word.upper()
+            combined_err_obj['hyp'] = f"ins: [{' '.join(ins_err_seq)}] {hyp_word}"
+            ins_err_seq = []
+        else:
+            last_non_ins_err_obj = combined_err_obj
+        combined_err_objs.append(combined_err_obj)
+
+    # if the last sequence is all ins-errors, then we have some leftover we need to deal with
+    if len(ins_err_seq) > 0:
+        hyp_word = last_non_ins_err_obj['hyp']
+        hyp_word = hyp_word.lower() if last_non_ins_err_obj['error'] == 'corr' else hyp_word.upper()
+        last_non_ins_err_obj['hyp'] = f"{hyp_word} ins: [{' '.join(ins_err_seq)}]"
+    return combined_err_objs
+
+
 def _fix_textgrid_boundaries(textgrid_obj, offset):
     new_textgrid_obj = textgrid_obj.new()
     new_textgrid_obj.maxTimestamp += offset
@@ -389,85 +519,329 @@ def _fix_textgrid_boundaries(textgrid_obj, offset):
     return new_textgrid_obj
 
 
-def find_and_add_marker_candidates(tg_dirpath, rules_filepath, phone_dict):
-    with open(rules_filepath, 'r+b') as rules_file:
-        rules_yaml = yaml.safe_load(rules_file.read())
+def find_and_add_marker_candidates(tg_dirpath, rules_filepaths, phone_dict):
+    """
+    Adds a `markers` and `poss-markers` tier for each rules file to every TextGrid in the
+     directory, and returns a summary of the markers found with each rules file.
+
+    Every rule entry's result for every token is cached in the directory, keyed by a fingerprint
+     of the entry, so re-running this after editing the rules only evaluates the added or changed
+     entries, and only rewrites the TextGrids whose marker tiers changed.
+    """
+    if isinstance(rules_filepaths, str):
+        rules_filepaths = [rules_filepaths]
+    rule_sets = _load_rule_sets(rules_filepaths)
+    rule_entries = {}
+    for compiled_rules in rule_sets.values():
+        for rule_list in compiled_rules.values():
+            for fingerprint, ref_rule, canon_rule in rule_list:
+                rule_entries[fingerprint] = ref_rule, canon_rule
+
+    marker_cache = load_marker_cache(tg_dirpath)
+    summaries = {
+        rule_set_name: Counter({
+            'tokens': 0, 'tokens_with_markers': 0, 'tokens_with_poss_markers': 0,
+            'tokens_with_differing_markers': 0, 'tokens_with_differing_poss_markers': 0
+        })
+        for rule_set_name in rule_sets
+    }
+    num_evaluated_entries = Counter()
+    num_rewritten_files = 0
 
     print("Analyzing rules for each file...")
     with std_out_err_redirect_tqdm() as orig_stdout:
-        filepaths = list(get_input_filepaths(tg_dirpath, acceptable_exts=['textgrid']))
+        filepaths = sorted(get_input_filepaths(tg_dirpath, acceptable_exts=['textgrid']))
         for filepath in tqdm(filepaths, file=orig_stdout, dynamic_ncols=True):
-            tg = textgrid.openTextgrid(filepath, includeEmptyIntervals=True)
-
-            marker_tg_intervals = []
-            possible_marker_tg_intervals = []
-            for tg_interval in tg.getTier('word').entries:
-                if tg_interval.label in SILENCE_MARKERS_WORDS:
-                    continue
-
-                ref_word = tg_interval.label
-                if not re.match(r'\w+', ref_word):
-                    continue
-
-                ref_transcribed_phones = _get_phones_from_tg(tg, tg_interval)
-                if not ref_transcribed_phones:
-                    continue
-
-                canon_phonemic_reprs = get_phonemic_reprs(
-                    ref_word, ipa=True, phone_dict=phone_dict
+            filename = Path(filepath).name
+            tg = None
+            file_cache = marker_cache['files'].get(filename)
+            if file_cache is None:
+                tg = textgrid.openTextgrid(filepath, includeEmptyIntervals=True)
+                file_cache = {
+                    'tokens': _get_marker_tokens(tg, phone_dict), 'results': {}, 'tiers': {}
+                }
+                marker_cache['files'][filename] = file_cache
+            tokens, results = file_cache['tokens'], file_cache['results']
+
+            # the pronunciation dictionary may have changed since the results were cached, which
+            #  changes the results of every rule for the affected tokens
+            stale_token_idxs = []
+            for token_idx, token in enumerate(tokens):
+                start, end, ref_word, ref_transcribed_phones, canon_phonemic_reprs = token
+                new_canon_phonemic_reprs = tuple(
+                    get_phonemic_reprs(ref_word, ipa=True, phone_dict=phone_dict)
                 )
-                matched_markers = set()
-                possible_markers = set()
-                for rule_name, rule_list in rules_yaml.items():
-                    for rule_entry in rule_list:
-                        if rule_name in matched_markers:
-                            break  # if we've already matched, no need to keep going
-
-                        ref_rule_str, canon_rule_str = rule_entry['ref'], rule_entry['canon']
-                        ref_rule = parse_rule_to_regex(ref_rule_str)
-                        canon_rule = parse_rule_to_regex(canon_rule_str)
-
-                        has_a_match = False
-                        for phonemic_repr in canon_phonemic_reprs:
-                            has_a_match |= bool(re.match(canon_rule, phonemic_repr))
-                        if not has_a_match:
-                            continue  # All rules must match for this to be a candidate
-
-                        possible_markers.add(rule_name)
-
-                        # all rules must match for this to be a candidate
-                        if not re.match(ref_rule, ref_transcribed_phones):
-                            # the hand-annotated phones don't match the rule, so this isn't a
-                            #  candidate
-                            continue
-
-                        matched_markers.add(rule_name)
-
-                marker_tg_intervals.append(
-                    Interval(
-                        tg_interval.start, tg_interval.end, f"{' '.join(matched_markers)}"
+                if new_canon_phonemic_reprs != canon_phonemic_reprs:
+                    tokens[token_idx] = (
+                        start, end, ref_word, ref_transcribed_phones, new_canon_phonemic_reprs
                     )
-                )
-                possible_marker_tg_intervals.append(
-                    Interval(
-                        tg_interval.start, tg_interval.end, f"{' '.join(possible_markers)}"
+                    stale_token_idxs.append(token_idx)
+
+            for fingerprint in list(results):
+                if fingerprint not in rule_entries:
+                    del results[fingerprint]
+            for fingerprint, (ref_rule, canon_rule) in rule_entries.items():
+                if fingerprint in results:
+                    token_idxs_to_evaluate = stale_token_idxs
+                else:
+                    results[fingerprint] = bytearray(len(tokens))
+                    token_idxs_to_evaluate = range(len(tokens))
+                    num_evaluated_entries[fingerprint] += 1
+                for token_idx in token_idxs_to_evaluate:
+                    _, _, _, ref_transcribed_phones, canon_phonemic_reprs = tokens[token_idx]
+                    results[fingerprint][token_idx] = _evaluate_rule_entry(
+                        ref_rule, canon_rule, ref_transcribed_phones, canon_phonemic_reprs
                     )
+
+            new_tiers = {}
+            baseline_markers = None
+            for rule_set_name, compiled_rules in rule_sets.items():
+                marker_labels = []
+                possible_marker_labels = []
+                for token_idx in range(len(tokens)):
+                    matched_markers, possible_markers = _get_markers(
+                        compiled_rules, results, token_idx
+                    )
+                    marker_labels.append(' '.join(matched_markers))
+                    possible_marker_labels.append(' '.join(possible_markers))
+
+                # the labels are ordered by each rules file, so compare which markers each token
+                #  has rather than the labels, which would differ for reordered but identical rules
+                marker_sets = [set(label.split()) for label in marker_labels]
+                possible_marker_sets = [set(label.split()) for label in possible_marker_labels]
+                if baseline_markers is None:
+                    baseline_markers = marker_sets, possible_marker_sets
+                summary = summaries[rule_set_name]
+                summary['tokens'] += len(tokens)
+                summary['tokens_with_markers'] += sum(map(bool, marker_labels))
+                summary['tokens_with_poss_markers'] += sum(map(bool, possible_marker_labels))
+                summary['tokens_with_differing_markers'] += sum(
+                    map(set.__ne__, marker_sets, baseline_markers[0])
+                )
+                summary['tokens_with_differing_poss_markers'] += sum(
+                    map(set.__ne__, possible_marker_sets, baseline_markers[1])
                 )
 
-            # create and add tiers
-            markers_interval_tier = IntervalTier(
-                'markers', marker_tg_intervals,
-                minT=tg.minTimestamp, maxT=tg.maxTimestamp
-            )
-            possible_markers_interval_tier = IntervalTier(
-                'poss-markers', possible_marker_tg_intervals,
-                minT=tg.minTimestamp, maxT=tg.maxTimestamp
-            )
+                markers_tier_name, possible_markers_tier_name = _get_marker_tier_names(
+                    rule_set_name, len(rule_sets)
+                )
+                new_tiers[markers_tier_name] = marker_labels
+                new_tiers[possible_markers_tier_name] = possible_marker_labels
+
+            if new_tiers == file_cache['tiers']:
+                continue  # none of this file's markers changed, so there's nothing to rewrite
 
-            # tierIndex 0 = 'word', tierIndex 1 = 'phone'
-            tg.addTier(markers_interval_tier, tierIndex=2)
-            tg.addTier(possible_markers_interval_tier, tierIndex=3)
+            if tg is None:
+                tg = textgrid.openTextgrid(filepath, includeEmptyIntervals=True)
+            _replace_marker_tiers(tg, new_tiers, tokens)
             tg.save(filepath, "long_textgrid", includeBlankSpaces=True, reportingMode="error")
+            file_cache['tiers'] = new_tiers
+            num_rewritten_files += 1
+
+    save_marker_cache(marker_cache, tg_dirpath)
+    print(
+        f"Evaluated {len(num_evaluated_entries)} new or changed of {len(rule_entries)} rule"
+        f" entries, and rewrote {num_rewritten_files} of {len(filepaths)} TextGrids."
+    )
+    return {
+        rule_set_name: dict(summary) for rule_set_name, summary in summaries.items()
+    }
+
+
+def _get_marker_tokens(tg, phone_dict):
+    """
+    Returns the `(start, end, ref_word, ref_transcribed_phones, canon_phonemic_reprs)` of each
+     word in the TextGrid that rules can be evaluated against.
+    """
+    tokens = []
+    for tg_interval in tg.getTier('word').entries:
+        if tg_interval.label in SILENCE_MARKERS_WORDS:
+            continue
+
+        ref_word = tg_interval.label
+        if not re.match(r'\w+', ref_word):
+            continue
+
+        ref_transcribed_phones = _get_phones_from_tg(tg, tg_interval)
+        if not ref_transcribed_phones:
+            continue
+
+        canon_phonemic_reprs = get_phonemic_reprs(ref_word, ipa=True, phone_dict=phone_dict)
+        tokens.append((
+            tg_interval.start, tg_interval.end, ref_word, ref_transcribed_phones,
+            tuple(canon_phonemic_reprs)
+        ))
+    return tokens
+
+
+def _load_rule_sets(rules_filepaths):
+    """
+    Loads and compiles each rules file, keyed by a name unique among the given rule sets. The
+     first rules file is the baseline that the others are compared against.
+    """
+    rule_sets = {}
+    for rules_filepath in rules_filepaths:
+        with open(rules_filepath, 'r+b') as rules_file:
+            rules_yaml = yaml.safe_load(rules_file.read())
+
+        rule_set_name = Path(rules_filepath).stem
+        if rule_set_name in rule_sets:
+            rule_set_name = f"{rule_set_name}-{len(rule_sets)}"
+        rule_sets[rule_set_name] = _compile_rules(rules_yaml)
+    return rule_sets
+
+
+def _compile_rules(rules_yaml):
+    return {
+        rule_name: [
+            (
+                get_rule_entry_fingerprint(rule_entry),
+                re.compile(parse_rule_to_regex(rule_entry['ref'])),
+                re.compile(parse_rule_to_regex(rule_entry['canon']))
+            )
+            for rule_entry in rule_list
+        ]
+        for rule_name, rule_list in rules_yaml.items()
+    }
+
+
+def get_rule_entry_fingerprint(rule_entry):
+    # the IPA characters are included since they change what `(?#all_ipa)` expands to
+    fingerprint_str = '\0'.join(
+        [rule_entry['ref'], rule_entry['canon'], ''.join(sorted(ALL_IPA_GROUP))]
+    )
+    return hashlib.sha1(fingerprint_str.encode('utf-8')).hexdigest()
+
+
+def _evaluate_rule_entry(ref_rule, canon_rule, ref_transcribed_phones, canon_phonemic_reprs):
+    has_a_match = False
+    for phonemic_repr in canon_phonemic_reprs:
+        has_a_match |= bool(canon_rule.match(phonemic_repr))
+    if not has_a_match:
+        return RULE_ENTRY_UNMATCHED  # All rules must match for this to be a candidate
+
+    # all rules must match for this to be a candidate
+    if not ref_rule.match(ref_transcribed_phones):
+        # the hand-annotated phones don't match the rule, so this isn't a candidate
+        return RULE_ENTRY_POSSIBLE
+
+    return RULE_ENTRY_MATCHED
+
+
+def _get_markers(compiled_rules, results, token_idx):
+    matched_markers = []
+    possible_markers = []
+    for rule_name, rule_list in compiled_rules.items():
+        rule_result = max(
+            (results[fingerprint][token_idx] for fingerprint, _, _ in rule_list),
+            default=RULE_ENTRY_UNMATCHED
+        )
+        if rule_result >= RULE_ENTRY_POSSIBLE:
+            possible_markers.append(rule_name)
+        if rule_result == RULE_ENTRY_MATCHED:
+            matched_markers.append(rule_name)
+    return matched_markers, possible_markers
+
+
+def _replace_marker_tiers(tg, new_tiers, tokens):
+    # this removes marker tiers the cache doesn't know about too, e.g., when the TextGrid was
+    #  written before the cache existed, or the cache was deleted
+    for tier_name in list(tg.tierNames):
+        if _is_marker_tier_name(tier_name):
+            tg.removeTier(tier_name)
+
+    # tierIndex 0 = 'word', tierIndex 1 = 'phone'
+    for tier_index, (tier_name, labels) in enumerate(new_tiers.items(), start=2):
+        intervals = [
+            Interval(start, end, label)
+            for (start, end, _, _, _), label in zip(tokens, labels)
+        ]
+        tg.addTier(
+            IntervalTier(tier_name, intervals, minT=tg.minTimestamp, maxT=tg.maxTimestamp),
+            tierIndex=tier_index
+        )
+
+
+def _is_marker_tier_name(tier_name):
+    return (
+        tier_name in ('markers', 'poss-markers')
+        or tier_name.startswith('markers-') or tier_name.startswith('poss-markers-')
+    )
+
+
+def load_marker_cache(tg_dirpath):
+    marker_cache_filepath = f"{tg_dirpath}/{MARKER_CACHE_FILENAME}"
+    try:
+        with open(marker_cache_filepath, 'rb') as marker_cache_file:
+            marker_cache = pickle.load(marker_cache_file)
+    except FileNotFoundError:
+        return {'version': MARKER_CACHE_VERSION, 'files': {}}
+    except (EOFError, pickle.UnpicklingError) as exc:
+        print(
+            f"Ignoring the marker cache at {marker_cache_filepath}, since it can't be read: {exc}",
+            file=sys.stderr
+        )
+        return {'version': MARKER_CACHE_VERSION, 'files': {}}
+    if not isinstance(marker_cache, dict) or marker_cache.get('version') != MARKER_CACHE_VERSION:
+        print(
+            f"Ignoring the marker cache at {marker_cache_filepath}, since it's from another"
+            f" version",
+            file=sys.stderr
+        )
+        return {'version': MARKER_CACHE_VERSION, 'files': {}}
+    return marker_cache
+
+
+def save_marker_cache(marker_cache, tg_dirpath):
+    marker_cache_filepath = f"{tg_dirpath}/{MARKER_CACHE_FILENAME}"
+    os.makedirs(tg_dirpath, exist_ok=True)
+    # write then rename, so an interrupted run can't leave a half-written cache behind
+    with open(f"{marker_cache_filepath}.tmp", 'wb') as marker_cache_file:
+        pickle.dump(marker_cache, marker_cache_file)
+    os.replace(f"{marker_cache_filepath}.tmp", marker_cache_filepath)
+
+
+def _get_marker_tier_names(rule_set_name, num_rule_sets):
+    if num_rule_sets == 1:
+        return 'markers', 'poss-markers'
+    return f'markers-{rule_set_name}', f'poss-markers-{rule_set_name}'
+
+
+def write_marker_summary(marker_summary, output_dir_path, datetime_str):
+    summary_filepath = f"{output_dir_path}/marker_summary_{datetime_str}.yaml"
+    with open(summary_filepath, 'w') as summary_file:
+        # keep the rules file order, since the first rules file is the baseline
+        yaml.safe_dump(marker_summary, summary_file, sort_keys=False)
+
+    baseline_name = next(iter(marker_summary))
+    print(f"Marker summary (compared against {baseline_name}):")
+    for rule_set_name, summary in marker_summary.items():
+        print(
+            f"\t{rule_set_name}: {summary['tokens_with_markers']}/{summary['tokens']} tokens with"
+            f" markers, {summary['tokens_with_differing_markers']} differing markers,"
+            f" {summary['tokens_with_differing_poss_markers']} differing poss-markers"
+        )
+    return summary_filepath
+
+
+def write_aligned_errors(aligned_error_dict, output_dir_path, datetime_str):
+    """
+    Exports the aligned errors for each speaker-task, with filepaths relative to the output
+     directory so that exports from different output directories can be merged.
+    """
+    aligned_errors_export = {}
+    for spkr_task_id, aligned_errors in aligned_error_dict.items():
+        aligned_errors_export[spkr_task_id] = {
+            'wav': os.path.relpath(aligned_errors['wav'], output_dir_path),
+            'textgrid': os.path.relpath(aligned_errors['textgrid'], output_dir_path),
+            'error_intervals': aligned_errors['error_intervals'],
+            'error_counts': dict(aligned_errors['error_counts'])
+        }
+
+    aligned_errors_filepath = f"{output_dir_path}/aligned_errors_{datetime_str}.yaml"
+    with open(aligned_errors_filepath, 'w') as aligned_errors_file:
+        yaml.safe_dump(aligned_errors_export, aligned_errors_file, allow_unicode=True)
+    return aligned_errors_filepath
 
 
 def _get_phones_from_tg(textgrid_obj, tg_interval):
@@ -0,0 +1,415 @@
+import json
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, Counter
+from itertools import chain
+from pathlib import Path
+
+import click as click
+from praatio import textgrid
+
+from error_analysis import get_ethnicity
+
+INDEX_MAGIC = b'LXIDX'
+INDEX_FORMAT_VERSION = 3
+ERROR_TYPES = ('corr', 'sub', 'del', 'ins')
+# typecodes of the per-token columns; every posting is a row number into these columns
+COLUMN_TYPECODES = {
+    'spkr_task': 'I', 'system': 'H', 'word': 'I', 'error': 'B', 'start': 'd', 'end': 'd'
+}
+GROUP_BY_CHOICES = ('ethnicity', 'spkr-task', 'system', 'error', 'word')
+# the column that each group-by field is read from
+GROUP_BY_COLUMNS = {
+    'ethnicity': 'spkr_task', 'spkr-task': 'spkr_task', 'system': 'system', 'error': 'error',
+    'word': 'word'
+}
+
+
+class LexicalIndex:
+    """
+    Inverted index over every aligned token, from each reference word, system, error type, and
+     matched marker to a postings list of the rows of the tokens it occurs in. Each row is a
+     (speaker-task, system, reference word, error type, start, end) token, stored column-wise, and
+     each speaker-task's rows are contiguous. Insertions have no reference word of their own, so
+     the `ins` postings are the tokens that insertions were combined into.
+    """
+
+    def __init__(
+            self, spkr_task_ids, systems, words, columns, word_postings, system_postings,
+            error_postings, marker_postings, read_postings=None
+    ):
+        self.spkr_task_ids = spkr_task_ids
+        self.systems = systems
+        self.words = words
+        self.columns = columns
+        # word_postings[word_idx], system_postings[system_idx], error_postings[error_idx], and
+        #  marker_postings[tier_name][marker] are sorted row numbers, or, for a loaded index,
+        #  where to read them from with `read_postings`
+        self.word_postings = word_postings
+        self.system_postings = system_postings
+        self.error_postings = error_postings
+        self.marker_postings = marker_postings
+        self._read_postings = read_postings
+        self._word_idxs = {word: word_idx for word_idx, word in enumerate(words)}
+        self.ethnicities = [
+            _get_ethnicity_or_unknown(spkr_task_id) for spkr_task_id in spkr_task_ids
+        ]
+
+    def __len__(self):
+        return len(self.columns['start'])
+
+    def save(self, filepath):
+        blob = bytearray()
+
+        def add_to_blob(arr):
+            offset = len(blob)
+            blob.extend(arr.tobytes())
+            return [offset, len(blob) - offset]
+
+        header = {
+            'version': INDEX_FORMAT_VERSION,
+            'byteorder': sys.byteorder,
+            'spkr_task_ids': self.spkr_task_ids,
+            'systems': self.systems,
+            'words': self.words,
+            'columns': {
+                column_name: add_to_blob(self.columns[column_name])
+                for column_name in COLUMN_TYPECODES
+            },
+            'word_postings': [
+                add_to_blob(self.get_postings(postings)) for postings in self.word_postings
+            ],
+            'system_postings': [
+                add_to_blob(self.get_postings(postings)) for postings in self.system_postings
+            ],
+            'error_postings': [
+                add_to_blob(self.get_postings(postings)) for postings in self.error_postings
+            ],
+            'marker_postings': {
+                tier_name: {
+                    marker: add_to_blob(self.get_postings(postings))
+                    for marker, postings in tier_postings.items()
+                }
+                for tier_name, tier_postings in self.marker_postings.items()
+            }
+        }
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        with open(filepath, 'wb') as index_file:
+            index_file.write(INDEX_MAGIC)
+            index_file.write(struct.pack('<Q', len(header_bytes)))
+            index_file.write(header_bytes)
+            index_file.write(blob)
+
+    @classmethod
+    def load(cls, filepath):
+        with open(filepath, 'rb') as index_file:
+            if index_file.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise RuntimeError(f"{filepath} is not a lexical index")
+            header_len, = struct.unpack('<Q', index_file.read(8))
+            header = json.loads(index_file.read(header_len).decode('utf-8'))
+            blob = index_file.read()
+        if header['version'] != INDEX_FORMAT_VERSION:
+            raise RuntimeError(
+                f"Expected lexical index version {INDEX_FORMAT_VERSION}, but {filepath} is"
+                f" version {header['version']}; please rebuild it"
+            )
+        swap_bytes = header['byteorder'] != sys.byteorder
+
+        def read_from_blob(typecode, offset_and_len):
+            offset, length = offset_and_len
+            arr = array(typecode, blob[offset:offset + length])
+            if swap_bytes:
+                arr.byteswap()
+            return arr
+
+        columns = {
+            column_name: read_from_blob(typecode, header['columns'][column_name])
+            for column_name, typecode in COLUMN_TYPECODES.items()
+        }
+        # postings are only decoded when they're queried, so loading stays fast for big indexes
+        return cls(
+            header['spkr_task_ids'], header['systems'], header['words'], columns,
+            header['word_postings'], header['system_postings'], header['error_postings'],
+            header['marker_postings'],
+            read_postings=lambda offset_and_len: read_from_blob('I', offset_and_len)
+        )
+
+    def get_postings(self, postings):
+        if isinstance(postings, array):
+            return postings
+        return self._read_postings(postings)
+
+    def query(
+            self, words=None, markers=None, markers_tier='markers', systems=None,
+            error_types=None, ethnicities=None
+    ):
+        """
+        Returns the sorted rows of the tokens with any of the given reference words, all of the
+         given markers, and any of the given systems, error types, and ethnicities. Filters that
+         are None aren't applied.
+        """
+        # each filter is the rows of each value it allows, any of which may match
+        filters = []
+        if words:
+            filters.append([
+                self.get_postings(self.word_postings[self._word_idxs[word.casefold()]])
+                for word in words if word.casefold() in self._word_idxs
+            ])
+        if markers:
+            tier_postings = self.marker_postings.get(markers_tier, {})
+            for marker in markers:
+                filters.append(
+                    [self.get_postings(tier_postings[marker])] if marker in tier_postings else []
+                )
+        if systems:
+            filters.append([
+                self.get_postings(self.system_postings[system_idx])
+                for system_idx in _get_idxs(self.systems, systems)
+            ])
+        if error_types:
+            filters.append([
+                self.get_postings(self.error_postings[error_idx])
+                for error_idx in _get_idxs(ERROR_TYPES, error_types)
+            ])
+        if ethnicities:
+            # each speaker-task's rows are contiguous, so they're found by bisecting its column
+            spkr_task_column = self.columns['spkr_task']
+            filters.append([
+                range(
+                    bisect_left(spkr_task_column, spkr_task_idx),
+                    bisect_right(spkr_task_column, spkr_task_idx)
+                )
+                for spkr_task_idx in _get_idxs(self.ethnicities, ethnicities)
+            ])
+
+        if not filters:
+            return range(len(self))
+        # intersect with the smallest filter first, so the set of rows stays as small as it can
+        filters.sort(key=lambda filter_postings: sum(map(len, filter_postings)))
+        rows = set(chain.from_iterable(filters[0]))
+        for filter_postings in filters[1:]:
+            if not rows:
+                break
+            rows.intersection_update(chain.from_iterable(filter_postings))
+        return sorted(rows)
+
+    def get_token(self, row):
+        return {
+            'spkr_task': self.spkr_task_ids[self.columns['spkr_task'][row]],
+            'system': self.systems[self.columns['system'][row]],
+            'word': self.words[self.columns['word'][row]],
+            'error': ERROR_TYPES[self.columns['error'][row]],
+            'start': self.columns['start'][row],
+            'end': self.columns['end'][row]
+        }
+
+    def count_groups(self, rows, group_by):
+        """
+        Returns the number of the given rows in each group of the `group_by` fields' values,
+         keyed by a tuple of those values.
+        """
+        # rows are counted by their column values, which are only looked up once for each group
+        column_names = list(dict.fromkeys(GROUP_BY_COLUMNS[field] for field in group_by))
+        group_columns = [
+            self.columns[column_name] if len(rows) == len(self)
+            else [self.columns[column_name][row] for row in rows]
+            for column_name in column_names
+        ]
+        if len(group_columns) == 1:
+            idx_counts = {(idx,): count for idx, count in Counter(group_columns[0]).items()}
+        else:
+            idx_counts = Counter(zip(*group_columns))
+
+        group_values = {
+            'ethnicity': self.ethnicities, 'spkr-task': self.spkr_task_ids,
+            'system': self.systems, 'error': ERROR_TYPES, 'word': self.words
+        }
+        group_counts = Counter()
+        for idx_key, count in idx_counts.items():
+            group_key = tuple(
+                group_values[field][idx_key[column_names.index(GROUP_BY_COLUMNS[field])]]
+                for field in group_by
+            )
+            group_counts[group_key] += count
+        return group_counts
+
+
+def build_lexical_index(aligned_error_dict, hyp_textgrids_dirpath):
+    """
+    Builds the lexical index from the aligned errors of every speaker-task, and the marker tiers
+     of their hyp TextGrids.
+    """
+    spkr_task_ids = []
+    systems = []
+    system_idxs = {}
+    word_idxs = {}
+    columns = {
+        column_name: array(typecode) for column_name, typecode in COLUMN_TYPECODES.items()
+    }
+    word_postings = []
+    system_postings = []
+    error_postings = [array('I') for _ in ERROR_TYPES]
+    marker_postings = defaultdict(lambda: defaultdict(lambda: array('I')))
+
+    for spkr_task_id in sorted(aligned_error_dict):
+        aligned_errors = aligned_error_dict[spkr_task_id]
+        spkr_task_idx = len(spkr_task_ids)
+        spkr_task_ids.append(spkr_task_id)
+
+        tg_suffix = Path(aligned_errors['textgrid']).suffix
+        marker_tiers = _get_marker_tiers(
+            f"{hyp_textgrids_dirpath}/{spkr_task_id}_hyp{tg_suffix}"
+        )
+        for system in sorted(aligned_errors['error_intervals']):
+            if system not in system_idxs:
+                system_idxs[system] = len(systems)
+                systems.append(system)
+                system_postings.append(array('I'))
+
+            for error_obj in aligned_errors['error_intervals'][system]:
+                if 'start' not in error_obj:
+                    continue  # this system's errors couldn't be aligned with the TextGrid
+
+                row = len(columns['start'])
+                word = error_obj['ref'].casefold()
+                if word not in word_idxs:
+                    word_idxs[word] = len(word_postings)
+                    word_postings.append(array('I'))
+                word_postings[word_idxs[word]].append(row)
+                system_postings[system_idxs[system]].append(row)
+                error_postings[ERROR_TYPES.index(error_obj['error'])].append(row)
+                # `combine_ins_errors` folds insertions into the hyp of an adjacent token
+                if 'ins:' in str(error_obj['hyp']):
+                    error_postings[ERROR_TYPES.index('ins')].append(row)
+
+                columns['spkr_task'].append(spkr_task_idx)
+                columns['system'].append(system_idxs[system])
+                columns['word'].append(word_idxs[word])
+                columns['error'].append(ERROR_TYPES.index(error_obj['error']))
+                columns['start'].append(error_obj['start'])
+                columns['end'].append(error_obj['end'])
+
+                midpoint = (error_obj['start'] + error_obj['end']) / 2
+                for tier_name, (interval_starts, intervals) in marker_tiers.items():
+                    interval_idx = bisect_right(interval_starts, midpoint) - 1
+                    if interval_idx < 0 or midpoint >= intervals[interval_idx].end:
+                        continue
+                    for marker in intervals[interval_idx].label.split():
+                        marker_postings[tier_name][marker].append(row)
+
+    return LexicalIndex(
+        spkr_task_ids, systems, list(word_idxs), columns, word_postings, system_postings,
+        error_postings,
+        {tier_name: dict(tier_postings) for tier_name, tier_postings in marker_postings.items()}
+    )
+
+
+def _get_marker_tiers(tg_filepath):
+    """
+    Returns the labelled intervals of each `markers` tier in the TextGrid, along with their start
+     times for bisecting, keyed by tier name.
+    """
+    if not Path(tg_filepath).exists():
+        return {}
+    tg = textgrid.openTextgrid(tg_filepath, includeEmptyIntervals=False)
+    marker_tiers = {}
+    for tier_name in tg.tierNames:
+        if tier_name != 'markers' and not tier_name.startswith('markers-'):
+            continue
+        intervals = sorted(tg.getTier(tier_name).entries)
+        marker_tiers[tier_name] = [interval.start for interval in intervals], intervals
+    return marker_tiers
+
+
+def _get_ethnicity_or_unknown(spkr_task_id):
+    try:
+        return get_ethnicity(spkr_task_id)
+    except RuntimeError:
+        return '?'
+
+
+def _get_idxs(values, allowed_values):
+    return {idx for idx, value in enumerate(values) if value in allowed_values}
+
+
+@click.command()
+@click.option(
+    '--index-path', prompt='Enter the filepath of the lexical index output by the analyzer\n',
+    help='The `lexical_index_{datetime}.bin` file in the analyzer\'s output directory.'
+)
+@click.option(
+    '--word', 'words', multiple=True,
+    help='Only count tokens of this reference word. May be given more than once to match any.'
+)
+@click.option(
+    '--marker', 'markers', multiple=True,
+    help='Only count tokens annotated with this marker, e.g., `(CC)`. May be given more than once'
+         ' to require all of them.'
+)
+@click.option(
+    '--markers-tier', default='markers', show_default=True,
+    help='The markers tier to look markers up in, e.g., `markers-{rules file name}` when several'
+         ' rules files were compared.'
+)
+@click.option('--system', 'systems', multiple=True, help='Only count tokens from this system.')
+@click.option(
+    '--error-type', 'error_types', multiple=True, type=click.Choice(ERROR_TYPES),
+    help='Only count tokens with this error type. `ins` counts the tokens that insertions were'
+         ' combined into.'
+)
+@click.option(
+    '--ethnicity', 'ethnicities', multiple=True,
+    help='Only count tokens from speakers with this ethnicity code.'
+)
+@click.option(
+    '--group-by', multiple=True, type=click.Choice(GROUP_BY_CHOICES),
+    help='Output counts grouped by these fields instead of the matching tokens.'
+)
+@click.option(
+    '--limit', default=20, show_default=True,
+    help='The maximum number of matching tokens to output when not grouping. 0 outputs all.'
+)
+def query_main(
+        index_path, words, markers, markers_tier, systems, error_types, ethnicities, group_by,
+        limit
+):
+    """
+    Query program that looks up and counts aligned tokens in the lexical index built by the
+     analyzer, e.g., every occurrence of `hand` that google substituted and that was annotated
+     with `(CC)`, grouped by ethnicity. Outputs tab-separated rows.
+    """
+    start = time.perf_counter()
+    lexical_index = LexicalIndex.load(index_path)
+    if markers and markers_tier not in lexical_index.marker_postings:
+        raise click.BadParameter(
+            f"{markers_tier!r} is not in the index; expected one of"
+            f" {', '.join(sorted(lexical_index.marker_postings)) or 'no marker tiers'}",
+            param_hint='--markers-tier'
+        )
+    rows = lexical_index.query(
+        words=words, markers=markers, markers_tier=markers_tier, systems=systems,
+        error_types=error_types, ethnicities=ethnicities
+    )
+
+    if group_by:
+        group_counts = lexical_index.count_groups(rows, group_by)
+        print('\t'.join(group_by + ('count',)))
+        for group_key, count in sorted(group_counts.items()):
+            print('\t'.join(map(str, group_key + (count,))))
+    else:
+        print('\t'.join(('spkr_task', 'system', 'word', 'error', 'start', 'end')))
+        for row in rows[:limit or None]:
+            print('\t'.join(map(str, lexical_index.get_token(row).values())))
+
+    elapsed_ms = (time.perf_counter() - start) * 1e3
+    print(
+        f"{len(rows)} matching tokens of {len(lexical_index)} ({elapsed_ms:.1f}ms)",
+        file=sys.stderr
+    )
+
+
+if __name__ == '__main__':
+    query_main()
@@ -0,0 +1,94 @@
+import textwrap
+from datetime import datetime
+from pathlib import Path
+
+import click as click
+import yaml
+
+from common_main_methods import get_latest_output_path
+from error_analysis.analyzer import (
+    find_and_add_marker_candidates, split_rules_input_path, write_marker_summary,
+    get_shard_manifest, write_shard_manifest
+)
+from error_analysis.lexical_index import build_lexical_index
+from phonemic import get_phone_dict
+
+
+@click.command()
+@click.option(
+    '--hyp-textgrids-dir-path',
+    prompt='Enter the `hyp_textgrids_{datetime}` directory output by the analyzer\n',
+    help=textwrap.dedent(
+        '''\
+        The directory of hyp TextGrids output by the analyzer, whose marker tiers should be
+         updated.
+        \n
+        '''
+    )
+)
+@click.option(
+    '--rules-input-path',
+    prompt='Enter the filepath(s) of the YAML-formatted regexp rules used to identify phonetic'
+           ' markers, separated by commas\n',
+    help=textwrap.dedent(
+        '''\
+        The filepath of the YAML-formatted regexp rules used to identify phonetic markers.
+        See example under marker_rules/mkscott_thesis_rules.yaml
+
+        Several comma-separated filepaths may be given, as with the analyzer.
+        \n
+        '''
+    )
+)
+@click.option(
+    '--pronunciation-dict-path', default=None,
+    help=textwrap.dedent(
+        '''\
+        The path for the CMUdict-formatted canonical pronunciation dictionary. If no filepath is
+        provided, CMUdict from NLTK will be used by default.
+        \n
+        '''
+    )
+)
+def marker_updater_main(hyp_textgrids_dir_path, rules_input_path, pronunciation_dict_path):
+    """
+    Update program that re-evaluates edited phonetic marker rules against the hyp TextGrids of a
+     previous analyzer run. Only the rule entries that were added or changed since the last run
+     are evaluated, and only the TextGrids whose `markers`/`poss-markers` tiers changed are
+     rewritten. The marker summary and lexical index are then written again alongside them.
+    """
+    phone_dict = get_phone_dict(pronunciation_dict_path)
+    hyp_textgrids_dir_path = hyp_textgrids_dir_path.rstrip('/')
+    rules_filepaths = split_rules_input_path(rules_input_path)
+    marker_summary = find_and_add_marker_candidates(
+        hyp_textgrids_dir_path, rules_filepaths, phone_dict
+    )
+
+    output_dir_path = str(Path(hyp_textgrids_dir_path).parent)
+    datetime_str = datetime.now().strftime('%d_%b_%y_%H-%M-%S%Z')
+    write_marker_summary(marker_summary, output_dir_path, datetime_str)
+
+    # the shard is unchanged, but the manifest has to record the rules the markers now come from
+    shard = None
+    shard_manifest_filepath = get_latest_output_path(output_dir_path, 'shard_manifest_')
+    if shard_manifest_filepath:
+        with open(shard_manifest_filepath, 'r') as shard_manifest_file:
+            shard_manifest = yaml.safe_load(shard_manifest_file)
+        shard = shard_manifest['shard'], shard_manifest['num_shards']
+    write_shard_manifest(
+        get_shard_manifest(shard, rules_filepaths, pronunciation_dict_path), output_dir_path,
+        datetime_str
+    )
+
+    # the index includes each token's markers, so it's stale now that they've been updated
+    aligned_errors_filepath = get_latest_output_path(output_dir_path, 'aligned_errors_')
+    if aligned_errors_filepath:
+        print("Building lexical index...")
+        with open(aligned_errors_filepath, 'r') as aligned_errors_file:
+            aligned_error_dict = yaml.safe_load(aligned_errors_file) or {}
+        lexical_index = build_lexical_index(aligned_error_dict, hyp_textgrids_dir_path)
+        lexical_index.save(f"{output_dir_path}/lexical_index_{datetime_str}.bin")
+
+
+if __name__ == '__main__':
+    marker_updater_main()
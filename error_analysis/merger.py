@@ -0,0 +1,153 @@
+import os
+import shutil
+import textwrap
+from collections import Counter
+from datetime import datetime
+
+import click as click
+import yaml
+
+from common_main_methods import get_input_filepaths, get_latest_output_path
+from error_analysis.analyzer import (
+    write_aligned_errors, write_marker_summary, write_shard_manifest, load_marker_cache,
+    save_marker_cache
+)
+from error_analysis.lexical_index import build_lexical_index
+
+
+@click.command()
+@click.option(
+    '--shard-output-dir-path', multiple=True, required=True,
+    help=textwrap.dedent(
+        '''\
+        The output directory of one shard of the analyzer, i.e., the `--output-dir-path` given
+         with `--shard`. Give this option once for each shard.
+        \n
+        '''
+    )
+)
+@click.option(
+    '--output-dir-path', prompt='Enter the path to output the merged files to\n',
+    help=textwrap.dedent(
+        '''\
+        The directory path to output the merged TextGrids, marker summary, aligned errors, and
+         lexical index.
+        \n
+        '''
+    )
+)
+def merger_main(shard_output_dir_path, output_dir_path):
+    """
+    Merge program that combines the outputs of analyzer runs over separate shards of the
+     speaker-tasks into the same outputs that a single analyzer run over all of them would give.
+     The shards' manifests must show that they're each of shards `0` to `N - 1` exactly once, run
+     with the same rules files and pronunciation dictionary.
+    """
+    shard_manifest = check_shard_manifests(shard_output_dir_path)
+
+    datetime_str = datetime.now().strftime('%d_%b_%y_%H-%M-%S%Z')
+    hyp_textgrids_dirpath = f"{output_dir_path}/hyp_textgrids_{datetime_str}"
+    os.makedirs(hyp_textgrids_dirpath, exist_ok=True)
+
+    aligned_error_dict = {}
+    marker_summary = {}
+    marker_cache = load_marker_cache(hyp_textgrids_dirpath)
+    for shard_dir in shard_output_dir_path:
+        print(f"Merging {shard_dir}...")
+        _merge_symlinks(f"{shard_dir}/symlinks", f"{output_dir_path}/symlinks")
+
+        shard_hyp_textgrids_dirpath = get_latest_output_path(shard_dir, 'hyp_textgrids_')
+        if shard_hyp_textgrids_dirpath:
+            for filepath in get_input_filepaths(shard_hyp_textgrids_dirpath, ['textgrid']):
+                new_filepath = f"{hyp_textgrids_dirpath}/{os.path.basename(filepath)}"
+                if os.path.exists(new_filepath):
+                    raise RuntimeError(
+                        f"{os.path.basename(filepath)} is in more than one shard; the shards"
+                        f" given must not overlap"
+                    )
+                shutil.copyfile(filepath, new_filepath)
+            marker_cache['files'] |= load_marker_cache(shard_hyp_textgrids_dirpath)['files']
+
+        aligned_errors_filepath = get_latest_output_path(shard_dir, 'aligned_errors_')
+        summary_filepath = get_latest_output_path(shard_dir, 'marker_summary_')
+        if not aligned_errors_filepath or not summary_filepath:
+            raise RuntimeError(f"Expected analyzer outputs in {shard_dir}, but found none")
+        with open(aligned_errors_filepath, 'r') as aligned_errors_file:
+            aligned_error_dict |= yaml.safe_load(aligned_errors_file) or {}
+
+        with open(summary_filepath, 'r') as summary_file:
+            for rule_set_name, summary in yaml.safe_load(summary_file).items():
+                marker_summary.setdefault(rule_set_name, Counter()).update(summary)
+
+    # the exported filepaths are already relative to their shard's output directory, so make them
+    #  absolute in the merged output directory before they're written out again
+    for aligned_errors in aligned_error_dict.values():
+        aligned_errors['wav'] = f"{output_dir_path}/{aligned_errors['wav']}"
+        aligned_errors['textgrid'] = f"{output_dir_path}/{aligned_errors['textgrid']}"
+    save_marker_cache(marker_cache, hyp_textgrids_dirpath)
+    # the merged outputs are the same as a single unsharded run's
+    write_shard_manifest(
+        {'shard': 0} | shard_manifest | {'num_shards': 1}, output_dir_path, datetime_str
+    )
+    write_aligned_errors(aligned_error_dict, output_dir_path, datetime_str)
+    write_marker_summary(
+        {rule_set_name: dict(summary) for rule_set_name, summary in marker_summary.items()},
+        output_dir_path, datetime_str
+    )
+
+    # the index's rows are numbered across all speaker-tasks, so it's rebuilt rather than merged
+    lexical_index = build_lexical_index(aligned_error_dict, hyp_textgrids_dirpath)
+    lexical_index.save(f"{output_dir_path}/lexical_index_{datetime_str}.bin")
+
+
+def check_shard_manifests(shard_dirs):
+    """
+    Checks that the shard output directories given are exactly shards `0` to `N - 1` of the same
+     run, each given once, and returns the manifest they share, excluding which shard each is.
+    """
+    shard_manifests = []
+    for shard_dir in shard_dirs:
+        shard_manifest_filepath = get_latest_output_path(shard_dir, 'shard_manifest_')
+        if not shard_manifest_filepath:
+            raise RuntimeError(f"Expected a shard manifest in {shard_dir}, but found none")
+        with open(shard_manifest_filepath, 'r') as shard_manifest_file:
+            shard_manifests.append((shard_dir, yaml.safe_load(shard_manifest_file)))
+
+    first_shard_dir, first_shard_manifest = shard_manifests[0]
+    shared_manifest = {
+        key: value for key, value in first_shard_manifest.items() if key != 'shard'
+    }
+    for shard_dir, shard_manifest in shard_manifests:
+        for key, value in shared_manifest.items():
+            if shard_manifest.get(key) != value:
+                raise RuntimeError(
+                    f"{shard_dir} has {key} {shard_manifest.get(key)!r}, but {first_shard_dir} has"
+                    f" {value!r}; the shards given must be from the same run"
+                )
+
+    shard_counts = Counter(shard_manifest['shard'] for _, shard_manifest in shard_manifests)
+    num_shards = shared_manifest['num_shards']
+    duplicate_shards = sorted(shard for shard, count in shard_counts.items() if count > 1)
+    if duplicate_shards:
+        raise RuntimeError(f"Shards {duplicate_shards} were given more than once")
+    missing_shards = sorted(set(range(num_shards)) - shard_counts.keys())
+    if missing_shards:
+        raise RuntimeError(f"Shards {missing_shards} of {num_shards} are missing")
+    return shared_manifest
+
+
+def _merge_symlinks(shard_symlink_root, symlink_output_root):
+    for filepath in get_input_filepaths(shard_symlink_root):
+        spkr_task_dirname = os.path.basename(os.path.dirname(filepath))
+        spkr_task_output_dir = f"{symlink_output_root}/{spkr_task_dirname}"
+        os.makedirs(spkr_task_output_dir, exist_ok=True)
+        try:
+            os.symlink(
+                os.readlink(filepath), f"{spkr_task_output_dir}/{os.path.basename(filepath)}"
+            )
+        except FileExistsError:
+            pass  # assumption is that if the file already exists, it's the one you want
+
+
+if __name__ == '__main__':
+    merger_main()
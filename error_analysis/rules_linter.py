@@ -0,0 +1,383 @@
+import math
+import multiprocessing
+import re
+import sys
+import textwrap
+import time
+
+import click as click
+import yaml
+
+from error_analysis.analyzer import parse_rule_to_regex, split_rules_input_path, ALL_IPA_GROUP
+from phonemic import get_phonemic_reprs, get_phone_dict, ARPABET_TO_IPA
+
+ALL_IPA_CHARS = frozenset(ALL_IPA_GROUP[1:-1])
+MULTI_CHAR_IPA_SYMBOLS = tuple(
+    sorted(symbol for symbol in set(ARPABET_TO_IPA.values()) if len(symbol) > 1)
+)
+SINGLE_CHAR_IPA_SYMBOLS = frozenset(
+    symbol for symbol in ARPABET_TO_IPA.values() if len(symbol) == 1
+)
+# lengths of the adversarial phone strings; the growth in match time between the last two lengths
+#  is used to estimate how the pattern scales
+ADVERSARIAL_LENGTHS = (64, 256, 1024)
+# a character that's in no IPA group, so appending it forces every anchored pattern to fail only
+#  after it has tried every way of consuming the rest of the string
+NON_IPA_CHAR = '#'
+# a rule pattern's elements: groups, counted repetitions, escape sequences, and single characters
+RULE_ELEMENT_REGEX = re.compile(r"\(\?#[^)]*\)|\{[^}]*\}|\\.|.", re.DOTALL)
+QUANTIFIERS = frozenset('+*?')
+MIN_TIMING_SECS = 0.002
+
+ERROR_FINDINGS = frozenset([
+    'invalid', 'unexpanded-group', 'non-ipa-literal', 'catastrophic', 'slow', 'unmatched'
+])
+
+
+@click.command()
+@click.option(
+    '--rules-input-path',
+    prompt='Enter the filepath(s) of the YAML-formatted regexp rules to lint, separated by'
+           ' commas\n',
+    help=textwrap.dedent(
+        '''\
+        The filepath of the YAML-formatted regexp rules used to identify phonetic markers.
+        See example under marker_rules/mkscott_thesis_rules.yaml
+        \n
+        '''
+    )
+)
+@click.option(
+    '--pronunciation-dict-path', default=None,
+    help=textwrap.dedent(
+        '''\
+        The path for the CMUdict-formatted canonical pronunciation dictionary to time each rule
+        against. If no filepath is provided, CMUdict from NLTK will be used by default.
+        \n
+        '''
+    )
+)
+@click.option(
+    '--slow-threshold-us', default=20.0, show_default=True,
+    help='Mean microseconds per dictionary pronunciation above which a rule is flagged as slow.'
+)
+@click.option(
+    '--max-growth', default=2.5, show_default=True,
+    help=textwrap.dedent(
+        '''\
+        Exponent of match time growth on adversarial phone strings above which a rule is flagged
+         as catastrophically backtracking. Rules that grow faster than linearly but below this
+         exponent are reported as superlinear warnings.
+        \n
+        '''
+    )
+)
+@click.option(
+    '--timeout-secs', default=10.0, show_default=True,
+    help='Seconds each rule pattern may take before it is flagged as catastrophically backtracking.'
+)
+def lint_rules_main(
+        rules_input_path, pronunciation_dict_path, slow_threshold_us, max_growth, timeout_secs
+):
+    """
+    Linter that expands every phonetic marker rule, times it against the pronunciation dictionary
+     and against adversarial long phone strings, and reports rules that are invalid, slow,
+     catastrophically backtracking, or never match, along with multi-character IPA symbols that
+     the `(?#all_ipa)` group breaks into single characters.
+    """
+    phone_dict = get_phone_dict(pronunciation_dict_path)
+    dict_phonemic_reprs = _get_dict_phonemic_reprs(phone_dict)
+
+    print(
+        f"`(?#all_ipa)` matches single characters, so these multi-character IPA symbols are split:"
+        f" {', '.join(MULTI_CHAR_IPA_SYMBOLS)}"
+    )
+
+    num_errors = 0
+    with RuleTimer(dict_phonemic_reprs, timeout_secs) as rule_timer:
+        for rules_filepath in split_rules_input_path(rules_input_path):
+            with open(rules_filepath, 'r+b') as rules_file:
+                rules_yaml = yaml.safe_load(rules_file.read())
+
+            print(f"Linting {rules_filepath} against {len(dict_phonemic_reprs)} pronunciations...")
+            for rule_name, rule_list in rules_yaml.items():
+                for entry_idx, rule_entry in enumerate(rule_list):
+                    for side in ('canon', 'ref'):
+                        findings = lint_rule(
+                            rule_entry[side], rule_timer, slow_threshold_us, max_growth,
+                            is_canon=side == 'canon'
+                        )
+                        for finding, message in findings:
+                            severity = 'ERROR' if finding in ERROR_FINDINGS else 'WARNING'
+                            num_errors += severity == 'ERROR'
+                            print(
+                                f"{severity} [{finding}] {rule_name}[{entry_idx}].{side}:"
+                                f" {rule_entry[side]}\n\t{message}",
+                                file=sys.stderr if severity == 'ERROR' else sys.stdout
+                            )
+
+    print(f"Found {num_errors} rule errors.")
+    if num_errors:
+        sys.exit(1)
+
+
+def lint_rule(rule_str, rule_timer, slow_threshold_us, max_growth, is_canon=True):
+    """
+    Returns a list of `(finding, message)` pairs for a single rule pattern, e.g.,
+     `('unmatched', 'Never matched ...')`. Only canon rules are expected to match dictionary
+     pronunciations, since ref rules describe the non-canonical hand-annotated phones.
+    """
+    findings = []
+    regex_str = parse_rule_to_regex(rule_str)
+    # anything left that looks like `(?#...)` is a typo'd group that Python treats as a comment,
+    #  so it silently matches nothing instead of a set of IPA characters
+    for unexpanded_group in re.findall(r"\(\?#[^)]*\)", regex_str):
+        findings.append(
+            ('unexpanded-group', f"{unexpanded_group} is not a known group and matches nothing")
+        )
+    non_ipa_chars = _get_literal_non_ipa_chars(rule_str)
+    if non_ipa_chars:
+        findings.append((
+            'non-ipa-literal',
+            f"Literal characters {', '.join(non_ipa_chars)} are not IPA symbols produced from"
+            f" ARPABET, so they can never match"
+        ))
+    try:
+        re.compile(regex_str)
+    except re.error as exc:
+        findings.append(('invalid', f"Expanded regexp does not compile: {exc}"))
+        return findings
+
+    split_symbols = _get_split_multi_char_symbols(rule_str)
+    if split_symbols:
+        findings.append((
+            'multi-char-ipa',
+            f"Literal characters next to `(?#all_ipa)`, an exclusion group, or each other can match"
+            f" part of the multi-character symbols {', '.join(split_symbols)}"
+        ))
+
+    dict_phonemic_reprs = rule_timer.dict_phonemic_reprs
+    try:
+        num_matches, dict_secs, adversarial_secs = rule_timer.time_rule(
+            regex_str, _get_adversarial_strings(rule_str)
+        )
+    except multiprocessing.TimeoutError:
+        findings.append((
+            'catastrophic',
+            f"Did not finish matching the dictionary and adversarial strings within"
+            f" {rule_timer.timeout_secs}s"
+        ))
+        return findings
+
+    mean_dict_us = dict_secs / max(len(dict_phonemic_reprs), 1) * 1e6
+    if mean_dict_us > slow_threshold_us:
+        findings.append((
+            'slow',
+            f"Took {mean_dict_us:.1f}us per dictionary pronunciation ({dict_secs:.2f}s total)"
+        ))
+    if is_canon and not num_matches:
+        findings.append((
+            'unmatched',
+            f"Never matched any of {len(dict_phonemic_reprs)} dictionary pronunciations"
+        ))
+
+    (shorter_len, shorter_secs), (longer_len, longer_secs) = list(adversarial_secs.items())[-2:]
+    growth = math.log(max(longer_secs, 1e-9) / max(shorter_secs, 1e-9)) / math.log(
+        longer_len / shorter_len
+    )
+    growth_message = (
+        f"Match time grows as length^{growth:.1f} on adversarial phone strings"
+        f" ({longer_secs * 1e3:.2f}ms at {longer_len} phones)"
+    )
+    if growth > max_growth:
+        findings.append(('catastrophic', growth_message))
+    elif growth > 1.5:
+        findings.append(('superlinear', growth_message))
+
+    return findings
+
+
+def _get_dict_phonemic_reprs(phone_dict):
+    phonemic_reprs = set()
+    for word in phone_dict:
+        phonemic_reprs.update(get_phonemic_reprs(word, ipa=True, phone_dict=phone_dict))
+    return sorted(phonemic_reprs)
+
+
+def _get_split_multi_char_symbols(rule_str):
+    """
+    Returns the multi-character IPA symbols that a literal in the rule can match one character of,
+     i.e., a literal character of the symbol whose neighbouring element in the pattern can match
+     the symbol's other character, e.g., the `ɪ` in `(?#all_ipa)ɪ`, which also matches `aɪ`.
+    """
+    elements = RULE_ELEMENT_REGEX.findall(rule_str)
+    split_symbols = []
+    for symbol in MULTI_CHAR_IPA_SYMBOLS:
+        first_char, second_char = symbol
+        # a literal that spells out the whole symbol only splits it if its characters are also
+        #  symbols on their own, e.g., `ɔɪ`, which may be `ɔ` followed by `ɪ`
+        if _is_spelled_out(elements, symbol) and all(
+                char in SINGLE_CHAR_IPA_SYMBOLS for char in symbol
+        ):
+            split_symbols.append(symbol)
+            continue
+        for element_idx, element in enumerate(elements):
+            if (
+                    element == second_char
+                    and _can_match(_get_adjacent_element(elements, element_idx, -1), first_char)
+            ) or (
+                    element == first_char
+                    and _can_match(_get_adjacent_element(elements, element_idx, 1), second_char)
+            ):
+                split_symbols.append(symbol)
+                break
+    return split_symbols
+
+
+def _is_spelled_out(elements, symbol):
+    return any(
+        element == symbol[0] and _get_adjacent_element(elements, element_idx, 1) == symbol[1]
+        for element_idx, element in enumerate(elements)
+    )
+
+
+def _get_adjacent_element(elements, element_idx, step):
+    """
+    Returns the element that's matched just before (`step=-1`) or just after (`step=1`) the one at
+     `element_idx`, skipping quantifiers and parentheses, and any other alternatives of its group.
+     Returns None at either end of the pattern.
+    """
+    open_paren, close_paren = ('(', ')') if step == -1 else (')', '(')
+    element_idx += step
+    while 0 <= element_idx < len(elements):
+        element = elements[element_idx]
+        if element == '|':
+            # the adjacent element is outside this alternative's group
+            depth = 0
+            element_idx += step
+            while 0 <= element_idx < len(elements):
+                if elements[element_idx] == close_paren:
+                    depth += 1
+                elif elements[element_idx] == open_paren:
+                    if not depth:
+                        break
+                    depth -= 1
+                element_idx += step
+        elif not (element in QUANTIFIERS or element in '()' or element.startswith('{')):
+            return element
+        element_idx += step
+    return None
+
+
+def _can_match(element, char):
+    if element is None:
+        return False
+    if element.startswith('(?#^'):
+        return char not in element[4:-1]
+    return element in ('(?#all_ipa)', '.')
+
+
+def _get_literal_ipa_chars(rule_str):
+    # characters inside `(?#^...)` are exclusions, so they're literals as far as splitting goes
+    rule_str = re.sub(r"\(\?#(?!\^)[^)]*\)", '', rule_str)
+    return sorted(set(char for char in rule_str if char in ALL_IPA_CHARS))
+
+
+def _get_literal_non_ipa_chars(rule_str):
+    # drop the groups and any escape sequences (e.g., `\\w`), which aren't literal phones
+    rule_str = re.sub(r"\(\?#[^)]*\)|\\.", '', rule_str)
+    return sorted(set(char for char in rule_str if char.isalpha() and char not in ALL_IPA_CHARS))
+
+
+def _get_adversarial_strings(rule_str):
+    """
+    Builds long phone strings that almost match the rule, so that a backtracking regexp engine
+     tries as many ways of splitting them as it can before failing, keyed by length.
+    """
+    alphabet = _get_literal_ipa_chars(rule_str) or sorted(ALL_IPA_CHARS)[:1]
+    all_ipa_str = ''.join(sorted(ALL_IPA_CHARS))
+    adversarial_strings = {}
+    for length in ADVERSARIAL_LENGTHS:
+        strings = [char * length for char in alphabet]
+        strings.append((''.join(alphabet) * length)[:length])
+        strings.append((all_ipa_str * length)[:length])
+        adversarial_strings[length] = [string + NON_IPA_CHAR for string in strings]
+    return adversarial_strings
+
+
+class RuleTimer:
+    """
+    Times rule patterns in a single worker process that keeps the dictionary pronunciations, so
+     they're only sent to it once. The worker is only restarted after a pattern times out.
+    """
+
+    def __init__(self, dict_phonemic_reprs, timeout_secs):
+        self.dict_phonemic_reprs = dict_phonemic_reprs
+        self.timeout_secs = timeout_secs
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def time_rule(self, regex_str, adversarial_strings):
+        """
+        Returns `(num_matches, dict_secs, adversarial_secs)` for the pattern, or raises
+         `multiprocessing.TimeoutError` if it takes longer than `timeout_secs`.
+        """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(
+                processes=1, initializer=_init_timing_worker, initargs=(self.dict_phonemic_reprs,)
+            )
+        async_result = self._pool.apply_async(_time_rule, (regex_str, adversarial_strings))
+        try:
+            return async_result.get(timeout=self.timeout_secs)
+        except multiprocessing.TimeoutError:
+            # the worker is stuck matching, so it's the only way to stop it
+            self._pool.terminate()
+            self._pool = None
+            raise
+
+
+_worker_dict_phonemic_reprs = []
+
+
+def _init_timing_worker(dict_phonemic_reprs):
+    global _worker_dict_phonemic_reprs
+    _worker_dict_phonemic_reprs = dict_phonemic_reprs
+
+
+def _time_rule(regex_str, adversarial_strings):
+    pattern = re.compile(regex_str)
+
+    num_matches = 0
+    start = time.perf_counter()
+    for phonemic_repr in _worker_dict_phonemic_reprs:
+        if pattern.match(phonemic_repr):
+            num_matches += 1
+    dict_secs = time.perf_counter() - start
+
+    adversarial_secs = {}
+    for length, strings in adversarial_strings.items():
+        adversarial_secs[length] = max(_time_match(pattern, string) for string in strings)
+    return num_matches, dict_secs, adversarial_secs
+
+
+def _time_match(pattern, string):
+    num_loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(num_loops):
+            pattern.match(string)
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_TIMING_SECS:
+            return elapsed / num_loops
+        num_loops *= 2
+
+
+if __name__ == '__main__':
+    lint_rules_main()
@@ -0,0 +1,268 @@
+import json
+import os
+import re
+import sys
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import click as click
+from praatio import textgrid
+from tqdm import tqdm
+
+from error_analysis import get_ethnicity
+from error_analysis.analyzer import (
+    group_input_filepaths, get_error_objs, combine_ins_errors, get_filtered_word_intervals,
+    SILENCE_MARKERS_WORDS, SILENCE_MARKERS_PHONES
+)
+from phonemic import ARPABET_TO_IPA
+
+REQUIRED_TIERS = ('word', 'phone')
+# only the first few token mismatches are listed, since one missing token misaligns the rest
+MAX_LISTED_MISMATCHES = 10
+# boundaries within this many seconds of each other are treated as the same boundary
+BOUNDARY_TOLERANCE_SECS = 1e-6
+
+
+@click.command()
+@click.option(
+    '--pra-inputs-dir-path',
+    prompt='Enter the directory that contains the sclite diffs between the reference transcripts'
+           ' and the hypothesis transcripts\n',
+    help='The directory of sclite .pra files, in the same format given to the analyzer.'
+)
+@click.option(
+    '--textgrid-inputs-dir-path',
+    prompt='Enter the directory that contains the Praat TextGrids with phones and words\n',
+    help='The directory of Praat TextGrids, in the same format given to the analyzer.'
+)
+@click.option(
+    '--wav-inputs-dir-path',
+    prompt='Enter the directory that contains the reference WAVE files\n',
+    help='The directory of reference WAVE files, in the same format given to the analyzer.'
+)
+@click.option(
+    '--report-path', default=None,
+    help=textwrap.dedent(
+        '''\
+        The filepath to write the JSON validation report to. If no filepath is provided, the
+         report is written to stdout.
+        \n
+        '''
+    )
+)
+@click.option(
+    '--num-workers', default=None, type=int,
+    help='The number of processes to validate with. Defaults to the number of CPUs.'
+)
+def validator_main(
+        pra_inputs_dir_path, textgrid_inputs_dir_path, wav_inputs_dir_path, report_path,
+        num_workers
+):
+    """
+    Pre-flight validation that checks every speaker-task's inputs for the problems that would
+     otherwise only surface partway through the analyzer: malformed filenames, missing or
+     duplicate files, missing tiers, `.pra` tokens that don't line up with the `word` tier, and
+     `phone` tier intervals that don't line up with the `word` tier. Outputs a JSON report and
+     exits with a non-zero status if any speaker-task is invalid.
+    """
+    filepath_dict = group_input_filepaths(
+        pra_inputs_dir_path, textgrid_inputs_dir_path, wav_inputs_dir_path
+    )
+    spkr_task_items = sorted(
+        (spkr_task_id, sorted(filepaths)) for spkr_task_id, filepaths in filepath_dict.items()
+    )
+
+    spkr_task_reports = {}
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        results = executor.map(
+            validate_spkr_task, spkr_task_items,
+            chunksize=max(1, len(spkr_task_items) // ((num_workers or os.cpu_count()) * 4))
+        )
+        for spkr_task_id, issues in tqdm(
+                results, total=len(spkr_task_items), file=sys.stderr, dynamic_ncols=True
+        ):
+            spkr_task_reports[spkr_task_id] = {'valid': not issues, 'issues': issues}
+
+    report = {
+        'num_spkr_tasks': len(spkr_task_reports),
+        'num_invalid': sum(
+            not spkr_task_report['valid'] for spkr_task_report in spkr_task_reports.values()
+        ),
+        'spkr_tasks': spkr_task_reports
+    }
+    report_str = json.dumps(report, indent=2, ensure_ascii=False)
+    if report_path:
+        with open(report_path, 'w') as report_file:
+            report_file.write(report_str)
+    else:
+        print(report_str)
+
+    print(
+        f"{report['num_invalid']} of {report['num_spkr_tasks']} speaker-tasks are invalid.",
+        file=sys.stderr
+    )
+    if report['num_invalid']:
+        sys.exit(1)
+
+
+def validate_spkr_task(spkr_task_item):
+    """
+    Validates a single speaker-task's inputs, given as `(spkr_task_id, filepaths)`, and returns
+     `(spkr_task_id, issues)`, where each issue is a dict with a `check` and a `message`.
+    """
+    spkr_task_id, filepaths = spkr_task_item
+    issues = []
+    try:
+        _validate_spkr_task_files(spkr_task_id, filepaths, issues)
+    except Exception as exc:
+        # one unexpected problem shouldn't stop the rest of the speaker-tasks from being reported
+        issues.append(_make_issue('unexpected', f"Validation failed: {exc!r}"))
+    return spkr_task_id, issues
+
+
+def _validate_spkr_task_files(spkr_task_id, filepaths, issues):
+    try:
+        get_ethnicity(spkr_task_id)
+    except RuntimeError as exc:
+        issues.append(_make_issue('filename', str(exc)))
+
+    filepaths_by_ext = {'.pra': [], '.textgrid': [], '.wav': []}
+    for filepath in filepaths:
+        filepaths_by_ext[Path(filepath).suffix.lower()].append(filepath)
+    if not filepaths_by_ext['.pra']:
+        issues.append(_make_issue('file-count', "Expected at least 1 .pra file, but found 0"))
+    for ext in ('.wav', '.textgrid'):
+        if len(filepaths_by_ext[ext]) != 1:
+            issues.append(_make_issue(
+                'file-count',
+                f"Expected only 1 {ext} file, but found {len(filepaths_by_ext[ext])}",
+                filepaths=filepaths_by_ext[ext]
+            ))
+    if len(filepaths_by_ext['.textgrid']) != 1:
+        return
+
+    tg_filepath = filepaths_by_ext['.textgrid'][0]
+    try:
+        textgrid_obj = textgrid.openTextgrid(tg_filepath, includeEmptyIntervals=True)
+    except Exception as exc:
+        issues.append(
+            _make_issue('textgrid', f"Could not open TextGrid: {exc}", file=tg_filepath)
+        )
+        return
+
+    missing_tiers = [
+        tier_name for tier_name in REQUIRED_TIERS if tier_name not in textgrid_obj.tierNames
+    ]
+    if missing_tiers:
+        issues.append(_make_issue(
+            'tiers', f"Missing required tiers: {', '.join(missing_tiers)}", file=tg_filepath
+        ))
+        return
+
+    filtered_tg_intervals = get_filtered_word_intervals(textgrid_obj)
+    for pra_filepath in filepaths_by_ext['.pra']:
+        issues.extend(_validate_pra_alignment(pra_filepath, filtered_tg_intervals))
+    issues.extend(_validate_phone_word_overlap(textgrid_obj, tg_filepath))
+
+
+def _validate_pra_alignment(pra_filepath, filtered_tg_intervals):
+    issues = []
+    try:
+        combined_err_objs = combine_ins_errors(get_error_objs(pra_filepath))
+    except Exception as exc:
+        return [_make_issue('pra', f"Could not read .pra: {exc}", file=pra_filepath)]
+    if len(filtered_tg_intervals) != len(combined_err_objs):
+        issues.append(_make_issue(
+            'token-count',
+            f"TextGrid has {len(filtered_tg_intervals)} word intervals, but the .pra file has"
+            f" {len(combined_err_objs)} tokens excluding insertion errors",
+            file=pra_filepath
+        ))
+
+    mismatches = []
+    for error_obj, tg_interval in zip(combined_err_objs, filtered_tg_intervals):
+        if error_obj['ref'].casefold() != tg_interval.label.casefold():
+            mismatches.append({
+                'index': error_obj['index'], 'expected': error_obj['ref'],
+                'actual': tg_interval.label, 'start': tg_interval.start, 'end': tg_interval.end
+            })
+    if mismatches:
+        issues.append(_make_issue(
+            'token-identity',
+            f"{len(mismatches)} .pra tokens don't match their word intervals",
+            file=pra_filepath, mismatches=mismatches[:MAX_LISTED_MISMATCHES]
+        ))
+    return issues
+
+
+def _validate_phone_word_overlap(textgrid_obj, tg_filepath):
+    """
+    Sweeps the word and phone tiers together to find the problems that `_get_phones_from_tg`
+     would either crash on or silently skip.
+    """
+    issues = []
+    phone_intervals = [
+        interval for interval in textgrid_obj.getTier('phone').entries
+        if interval.label and interval.label not in SILENCE_MARKERS_PHONES
+    ]
+    phone_idx = 0
+    for word_interval in textgrid_obj.getTier('word').entries:
+        word = word_interval.label
+        if not word or word in SILENCE_MARKERS_WORDS or not re.match(r'\w+', word):
+            continue
+
+        # skip the phones that end before this word starts; they can't overlap any later word
+        while (
+                phone_idx < len(phone_intervals)
+                and phone_intervals[phone_idx].end <= word_interval.start + BOUNDARY_TOLERANCE_SECS
+        ):
+            phone_idx += 1
+
+        overlapping_phones = []
+        overlap_idx = phone_idx
+        while (
+                overlap_idx < len(phone_intervals)
+                and phone_intervals[overlap_idx].start < word_interval.end - BOUNDARY_TOLERANCE_SECS
+        ):
+            overlapping_phones.append(phone_intervals[overlap_idx])
+            overlap_idx += 1
+
+        if not overlapping_phones:
+            issues.append(_make_issue(
+                'phone-word-overlap', f"Word {word!r} has no phones and will be skipped",
+                file=tg_filepath, start=word_interval.start, end=word_interval.end
+            ))
+            continue
+
+        if '-' in word:
+            issues.append(_make_issue(
+                'phone-word-overlap',
+                f"Word {word!r} contains '-', which is the phone-word intersection separator",
+                file=tg_filepath, start=word_interval.start, end=word_interval.end
+            ))
+        for phone_interval in overlapping_phones:
+            phone = phone_interval.label
+            if re.sub(r"\d", '', phone) not in ARPABET_TO_IPA:
+                issues.append(_make_issue(
+                    'phone-word-overlap', f"Phone {phone!r} in word {word!r} is not ARPABET",
+                    file=tg_filepath, start=phone_interval.start, end=phone_interval.end
+                ))
+            if (
+                    phone_interval.start < word_interval.start - BOUNDARY_TOLERANCE_SECS
+                    or phone_interval.end > word_interval.end + BOUNDARY_TOLERANCE_SECS
+            ):
+                issues.append(_make_issue(
+                    'phone-word-overlap',
+                    f"Phone {phone!r} crosses the boundary of word {word!r}",
+                    file=tg_filepath, start=phone_interval.start, end=phone_interval.end
+                ))
+    return issues
+
+
+def _make_issue(check, message, **details):
+    return {'check': check, 'message': message} | details
+
+
+if __name__ == '__main__':
+    validator_main()
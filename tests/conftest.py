@@ -0,0 +1,116 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+from praatio import textgrid
+from praatio.data_classes.interval_tier import IntervalTier
+from praatio.utilities.constants import Interval
+
+from common_main_methods import get_latest_output_path
+from error_analysis.__main__ import cli
+
+RULES_FILEPATH = Path(__file__).parents[1] / 'error_analysis/marker_rules/mkscott_thesis_rules.yaml'
+
+SPKR_TASK_IDS = ('EDP74CF1T_RP', 'EDP75AM1T_RP', 'EDP76CM2T_WL', 'EDP77AF1T_WL')
+SYSTEMS = ('amazon', 'google')
+# (word, canonical phones, hand-annotated phones)
+WORDS = (
+    ('the', 'DH AH0', 'DH AH0'),
+    ('hand', 'HH AE1 N D', 'HH AE1 N'),
+    ('went', 'W EH1 N T', 'W EH1 N'),
+    ('left', 'L EH1 F T', 'L EH1 F'),
+    ('bed', 'B EH1 D', 'B EH1 T'),
+    ('sandy', 'S AE1 N D IY0', 'S AE1 N IY0'),
+)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """
+    Builds a tiny corpus of speaker-tasks, each saying the same words in a different order, and
+     returns the analyzer's input paths.
+    """
+    corpus_dirpath = tmp_path / 'corpus'
+    for spkr_task_idx, spkr_task_id in enumerate(SPKR_TASK_IDS):
+        words = WORDS[spkr_task_idx:] + WORDS[:spkr_task_idx]
+        word_intervals, phone_intervals = [], []
+        time = 1.0
+        for word, _, ref_phones in words:
+            word_start = time
+            for phone in ref_phones.split():
+                phone_intervals.append(Interval(time, time + 0.1, phone))
+                time += 0.1
+            word_intervals.append(Interval(word_start, time, word))
+            word_intervals.append(Interval(time, time + 0.05, 'sp'))
+            phone_intervals.append(Interval(time, time + 0.05, 'sp'))
+            time += 0.05
+        tg = textgrid.Textgrid(minTimestamp=0.5, maxTimestamp=time + 1)
+        tg.addTier(IntervalTier('word', word_intervals, 0.5, time + 1))
+        tg.addTier(IntervalTier('phone', phone_intervals, 0.5, time + 1))
+        os.makedirs(corpus_dirpath / 'tg' / spkr_task_id)
+        tg.save(
+            str(corpus_dirpath / 'tg' / spkr_task_id / f"{spkr_task_id}.TextGrid"),
+            'long_textgrid', includeBlankSpaces=True
+        )
+        os.makedirs(corpus_dirpath / 'wav' / spkr_task_id)
+        (corpus_dirpath / 'wav' / spkr_task_id / f"{spkr_task_id}.wav").touch()
+
+        spkr_id, task = spkr_task_id.split('_')
+        pra_dirpath = corpus_dirpath / 'pra' / f"{spkr_id}#{task}_1"
+        os.makedirs(pra_dirpath)
+        for system in SYSTEMS:
+            # every other word is an error, either a substitution or a deletion
+            ref = ' '.join(
+                word if idx % 2 else word.upper() for idx, (word, _, _) in enumerate(words)
+            )
+            hyp = ' '.join(
+                word if idx % 2 else ('BAND' if system == 'google' else '***')
+                for idx, (word, _, _) in enumerate(words)
+            )
+            (pra_dirpath / f"{system}_hyp.trn.pra").write_text(
+                f"id: ({spkr_task_id})\nScores: x\nREF:  {ref}\nHYP:  {hyp}\nEval:\n"
+            )
+
+    pronunciation_dict_path = corpus_dirpath / 'dict.txt'
+    pronunciation_dict_path.write_text(
+        ''.join(f"{word.upper()}  {canon_phones}\n" for word, canon_phones, _ in WORDS)
+        + "BAND  B AE1 N D\n"
+    )
+    rules_input_path = corpus_dirpath / RULES_FILEPATH.name
+    shutil.copyfile(RULES_FILEPATH, rules_input_path)
+
+    return {
+        'pra_inputs_dir_path': str(corpus_dirpath / 'pra'),
+        'textgrid_inputs_dir_path': str(corpus_dirpath / 'tg'),
+        'wav_inputs_dir_path': str(corpus_dirpath / 'wav'),
+        'rules_input_path': str(rules_input_path),
+        'pronunciation_dict_path': str(pronunciation_dict_path),
+    }
+
+
+def run_cli(command, **options):
+    args = [command]
+    for option, values in options.items():
+        for value in values if isinstance(values, (list, tuple)) else [values]:
+            args.extend([f"--{option.replace('_', '-')}", str(value)])
+    result = CliRunner().invoke(cli, args, catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def get_output_files(output_dir_path):
+    """
+    Returns the contents of the latest analyzer outputs in `output_dir_path`, keyed by their names
+     without the datetime, e.g., `hyp_textgrids/EDP74CF1T_RP.TextGrid`.
+    """
+    output_files = {}
+    for prefix in ('aligned_errors_', 'marker_summary_', 'lexical_index_', 'shard_manifest_'):
+        output_files[prefix.rstrip('_')] = Path(
+            get_latest_output_path(output_dir_path, prefix)
+        ).read_bytes()
+    hyp_textgrids_dirpath = Path(get_latest_output_path(output_dir_path, 'hyp_textgrids_'))
+    for filepath in sorted(hyp_textgrids_dirpath.glob('*.TextGrid')):
+        output_files[f"hyp_textgrids/{filepath.name}"] = filepath.read_bytes()
+    return output_files
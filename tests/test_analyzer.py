@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import yaml
+from praatio import textgrid
+
+from common_main_methods import get_latest_output_path
+from conftest import run_cli, SPKR_TASK_IDS
+
+
+def _get_tier_names(output_dir_path):
+    hyp_textgrids_dirpath = get_latest_output_path(output_dir_path, 'hyp_textgrids_')
+    return {
+        spkr_task_id: textgrid.openTextgrid(
+            f"{hyp_textgrids_dirpath}/{spkr_task_id}_hyp.TextGrid", includeEmptyIntervals=False
+        ).tierNames
+        for spkr_task_id in SPKR_TASK_IDS
+    }
+
+
+def test_single_rules_file_marker_tiers(corpus, tmp_path):
+    run_cli('analyze', **corpus, output_dir_path=tmp_path)
+    for tier_names in _get_tier_names(tmp_path).values():
+        assert 'markers' in tier_names and 'poss-markers' in tier_names
+        assert not any(
+            tier_name.startswith(('markers-', 'poss-markers-')) for tier_name in tier_names
+        )
+
+
+def test_compare_rules_files(corpus, tmp_path):
+    rules_filepath = Path(corpus['rules_input_path'])
+    with open(rules_filepath, 'r') as rules_file:
+        rules_yaml = yaml.safe_load(rules_file)
+
+    # `bed` is annotated with a devoiced final /d/, so editing this entry removes its marker
+    edited_rules_yaml = yaml.safe_load(yaml.safe_dump(rules_yaml))
+    edited_rules_yaml['(Dv)'][1]['ref'] = '^(?#all_ipa)+s$'
+    reordered_rules_yaml = dict(reversed(rules_yaml.items()))
+    for rules_stem, new_rules_yaml in (
+            ('edited', edited_rules_yaml), ('reordered', reordered_rules_yaml)
+    ):
+        with open(rules_filepath.with_name(f"{rules_stem}.yaml"), 'w') as rules_file:
+            yaml.safe_dump(new_rules_yaml, rules_file, allow_unicode=True, sort_keys=False)
+    corpus['rules_input_path'] = ','.join(
+        str(rules_filepath.with_name(f"{rules_stem}.yaml"))
+        for rules_stem in (rules_filepath.stem, 'edited', 'reordered')
+    )
+    run_cli('analyze', **corpus, output_dir_path=tmp_path)
+
+    for tier_names in _get_tier_names(tmp_path).values():
+        assert 'markers' not in tier_names
+        for rules_stem in (rules_filepath.stem, 'edited', 'reordered'):
+            assert f"markers-{rules_stem}" in tier_names
+            assert f"poss-markers-{rules_stem}" in tier_names
+
+    with open(get_latest_output_path(tmp_path, 'marker_summary_'), 'r') as summary_file:
+        marker_summary = yaml.safe_load(summary_file)
+    assert list(marker_summary) == [rules_filepath.stem, 'edited', 'reordered']
+    # every speaker-task says `bed` once
+    assert marker_summary['edited']['tokens_with_differing_markers'] == len(SPKR_TASK_IDS)
+    assert marker_summary['reordered']['tokens_with_differing_markers'] == 0
+    assert marker_summary['reordered']['tokens_with_differing_poss_markers'] == 0
+    assert marker_summary['reordered']['tokens_with_markers'] > 0
@@ -0,0 +1,99 @@
+import shutil
+from collections import Counter
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+from praatio import textgrid
+
+from common_main_methods import get_latest_output_path
+from conftest import run_cli
+from error_analysis.__main__ import cli
+from error_analysis.lexical_index import LexicalIndex
+
+
+def test_query_matches_scanning_every_token(corpus, tmp_path):
+    run_cli('analyze', **corpus, output_dir_path=tmp_path)
+    lexical_index = LexicalIndex.load(get_latest_output_path(tmp_path, 'lexical_index_'))
+
+    tokens = [lexical_index.get_token(row) for row in range(len(lexical_index))]
+    expected_rows = [
+        row for row, token in enumerate(tokens)
+        if token['word'] in ('hand', 'bed') and token['system'] == 'google'
+        and token['error'] in ('corr', 'sub') and token['spkr_task'][5] in ('C', 'A')
+    ]
+    rows = lexical_index.query(
+        words=['HAND', 'bed'], systems=['google'], error_types=['corr', 'sub'],
+        ethnicities=['C', 'A']
+    )
+    assert expected_rows and rows == expected_rows
+
+    assert lexical_index.count_groups(rows, ('ethnicity', 'error', 'spkr-task')) == Counter(
+        (tokens[row]['spkr_task'][5], tokens[row]['error'], tokens[row]['spkr_task'])
+        for row in expected_rows
+    )
+
+
+def test_query_unknown_markers_tier(corpus, tmp_path):
+    run_cli('analyze', **corpus, output_dir_path=tmp_path)
+    result = CliRunner().invoke(cli, [
+        'query', '--index-path', get_latest_output_path(tmp_path, 'lexical_index_'),
+        '--marker', '(CC)', '--markers-tier', 'markers-v2'
+    ])
+    assert result.exit_code == 2
+    assert "expected one of markers" in result.output
+
+
+@pytest.mark.parametrize('compare_rules, markers_tier', [
+    (False, 'markers'),
+    (True, 'markers-rules_v2'),
+])
+def test_query_markers_matches_marker_tier(corpus, tmp_path, compare_rules, markers_tier):
+    if compare_rules:
+        rules_v2_filepath = Path(corpus['rules_input_path']).with_name('rules_v2.yaml')
+        shutil.copyfile(corpus['rules_input_path'], rules_v2_filepath)
+        corpus['rules_input_path'] += f",{rules_v2_filepath}"
+    run_cli('analyze', **corpus, output_dir_path=tmp_path)
+    lexical_index = LexicalIndex.load(get_latest_output_path(tmp_path, 'lexical_index_'))
+    hyp_textgrids_dirpath = get_latest_output_path(tmp_path, 'hyp_textgrids_')
+
+    expected_rows = []
+    marker_tiers = {}
+    for row in range(len(lexical_index)):
+        token = lexical_index.get_token(row)
+        if token['spkr_task'] not in marker_tiers:
+            marker_tiers[token['spkr_task']] = textgrid.openTextgrid(
+                f"{hyp_textgrids_dirpath}/{token['spkr_task']}_hyp.TextGrid",
+                includeEmptyIntervals=False
+            ).getTier(markers_tier)
+        midpoint = (token['start'] + token['end']) / 2
+        labels = [
+            interval.label for interval in marker_tiers[token['spkr_task']].entries
+            if interval.start <= midpoint < interval.end
+        ]
+        if token['system'] == 'google' and any('(CC)' in label.split() for label in labels):
+            expected_rows.append(row)
+
+    rows = lexical_index.query(markers=['(CC)'], markers_tier=markers_tier, systems=['google'])
+    assert expected_rows and rows == expected_rows
+
+
+def test_query_insertions(corpus, tmp_path):
+    # insert a word after the first token of one speaker-task's google hyp
+    pra_filepath = Path(corpus['pra_inputs_dir_path']) / 'EDP74CF1T#RP_1/google_hyp.trn.pra'
+    pra_lines = pra_filepath.read_text().splitlines()
+    for line_idx, (line_prefix, inserted_word) in enumerate([('REF:', '***'), ('HYP:', 'UM')]):
+        words = pra_lines[line_idx + 2].removeprefix(line_prefix).split()
+        words.insert(1, inserted_word)
+        pra_lines[line_idx + 2] = f"{line_prefix}  {' '.join(words)}"
+    pra_filepath.write_text('\n'.join(pra_lines) + '\n')
+
+    run_cli('analyze', **corpus, output_dir_path=tmp_path)
+    lexical_index = LexicalIndex.load(get_latest_output_path(tmp_path, 'lexical_index_'))
+
+    rows = lexical_index.query(error_types=['ins'])
+    assert len(rows) == 1
+    token = lexical_index.get_token(rows[0])
+    assert (token['spkr_task'], token['system'], token['word']) == (
+        'EDP74CF1T_RP', 'google', 'hand'
+    )
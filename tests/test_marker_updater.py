@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import yaml
+
+from common_main_methods import get_latest_output_path
+from conftest import run_cli, get_output_files
+
+
+def test_updated_markers_match_fresh_run(corpus, tmp_path):
+    run_cli('analyze', **corpus, output_dir_path=tmp_path / 'updated')
+    original_files = get_output_files(tmp_path / 'updated')
+
+    # `bed` is annotated with a devoiced final /d/, so editing this entry removes its marker
+    with open(corpus['rules_input_path'], 'r') as rules_file:
+        rules_yaml = yaml.safe_load(rules_file)
+    assert rules_yaml['(Dv)'][1] == {'canon': '^(?#all_ipa)+d$', 'ref': '^(?#all_ipa)+t$'}
+    rules_yaml['(Dv)'][1]['ref'] = '^(?#all_ipa)+s$'
+    with open(corpus['rules_input_path'], 'w') as rules_file:
+        yaml.safe_dump(rules_yaml, rules_file, allow_unicode=True, sort_keys=False)
+
+    result = run_cli(
+        'update-markers', rules_input_path=corpus['rules_input_path'],
+        pronunciation_dict_path=corpus['pronunciation_dict_path'],
+        hyp_textgrids_dir_path=get_latest_output_path(tmp_path / 'updated', 'hyp_textgrids_')
+    )
+    assert 'Evaluated 1 new or changed' in result.output
+    run_cli('analyze', **corpus, output_dir_path=tmp_path / 'fresh')
+
+    updated_files = get_output_files(tmp_path / 'updated')
+    assert updated_files != original_files
+    assert updated_files == get_output_files(tmp_path / 'fresh')
+
+
+def test_update_markers_without_cache(corpus, tmp_path):
+    run_cli('analyze', **corpus, output_dir_path=tmp_path / 'updated')
+    hyp_textgrids_dir_path = get_latest_output_path(tmp_path / 'updated', 'hyp_textgrids_')
+    (Path(hyp_textgrids_dir_path) / '.marker_cache.pickle').unlink()
+
+    run_cli(
+        'update-markers', rules_input_path=corpus['rules_input_path'],
+        pronunciation_dict_path=corpus['pronunciation_dict_path'],
+        hyp_textgrids_dir_path=hyp_textgrids_dir_path
+    )
+    run_cli('analyze', **corpus, output_dir_path=tmp_path / 'fresh')
+
+    assert get_output_files(tmp_path / 'updated') == get_output_files(tmp_path / 'fresh')
@@ -0,0 +1,39 @@
+import pytest
+
+from conftest import run_cli, get_output_files
+
+NUM_SHARDS = 3
+
+
+def test_merged_shards_match_single_run(corpus, tmp_path):
+    run_cli('analyze', **corpus, output_dir_path=tmp_path / 'single')
+    for shard_index in range(NUM_SHARDS):
+        run_cli(
+            'analyze', **corpus, output_dir_path=tmp_path / f"shard{shard_index}",
+            shard=f"{shard_index}/{NUM_SHARDS}"
+        )
+    run_cli(
+        'merge', output_dir_path=tmp_path / 'merged',
+        shard_output_dir_path=[tmp_path / f"shard{idx}" for idx in range(NUM_SHARDS)]
+    )
+
+    single_files = get_output_files(tmp_path / 'single')
+    assert any(name.startswith('hyp_textgrids/') for name in single_files)
+    assert get_output_files(tmp_path / 'merged') == single_files
+
+
+@pytest.mark.parametrize('shard_idxs, message', [
+    ((0, 2), r"Shards \[1\] of 3 are missing"),
+    ((0, 0, 1, 2), r"Shards \[0\] were given more than once"),
+])
+def test_merge_requires_every_shard_once(corpus, tmp_path, shard_idxs, message):
+    for shard_index in set(shard_idxs):
+        run_cli(
+            'analyze', **corpus, output_dir_path=tmp_path / f"shard{shard_index}",
+            shard=f"{shard_index}/{NUM_SHARDS}"
+        )
+    with pytest.raises(RuntimeError, match=message):
+        run_cli(
+            'merge', output_dir_path=tmp_path / 'merged',
+            shard_output_dir_path=[tmp_path / f"shard{idx}" for idx in shard_idxs]
+        )
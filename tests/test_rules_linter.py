@@ -0,0 +1,22 @@
+import pytest
+
+from error_analysis.rules_linter import _get_split_multi_char_symbols
+
+
+@pytest.mark.parametrize('rule_str, split_symbols', [
+    ('^(?#all_ipa)+ɪ$', ['aɪ', 'eɪ', 'ɔɪ']),
+    ('^(?#all_ipa)+(?#^ɔ)ɪ$', ['aɪ', 'eɪ']),
+    ('^(?#all_ipa)*(?#^ɑæʌɔaəɚɛɝeɪɨioʊuʉ)ɪ$', []),
+    ('^(?#all_ipa)+(ɪ|ʊ)n$', ['aɪ', 'aʊ', 'eɪ', 'oʊ', 'ɔɪ']),
+    ('^ɔ(?#all_ipa)+$', ['ɔɪ']),
+    ('^bɔɪ$', ['ɔɪ']),
+    ('^(?#all_ipa)+aɪ$', []),
+    ('^aɪ(?#all_ipa)+', []),
+    ('^eɪl(?#all_ipa)+$', []),
+    ('^(?#all_ipa)+oʊ(?#all_ipa)+$', []),
+    ('^ɪn$', []),
+    ('ə(ɪ|ʊ)', []),
+    ('^(?#all_ipa)+(?#^nm)d$', []),
+])
+def test_get_split_multi_char_symbols(rule_str, split_symbols):
+    assert _get_split_multi_char_symbols(rule_str) == split_symbols
@@ -0,0 +1,77 @@
+import json
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+from praatio import textgrid
+from praatio.utilities.constants import Interval
+
+from error_analysis.__main__ import cli
+
+SPKR_TASK_ID = 'EDP74CF1T_RP'
+
+
+def _validate(corpus, report_path):
+    result = CliRunner().invoke(cli, [
+        'validate', '--pra-inputs-dir-path', corpus['pra_inputs_dir_path'],
+        '--textgrid-inputs-dir-path', corpus['textgrid_inputs_dir_path'],
+        '--wav-inputs-dir-path', corpus['wav_inputs_dir_path'],
+        '--report-path', str(report_path), '--num-workers', '1'
+    ])
+    with open(report_path, 'r') as report_file:
+        return result.exit_code, json.load(report_file)
+
+
+def _get_pra_filepath(corpus):
+    spkr_id, task = SPKR_TASK_ID.split('_')
+    return Path(corpus['pra_inputs_dir_path']) / f"{spkr_id}#{task}_1/google_hyp.trn.pra"
+
+
+def _remove_wav(corpus):
+    (Path(corpus['wav_inputs_dir_path']) / SPKR_TASK_ID / f"{SPKR_TASK_ID}.wav").unlink()
+
+
+def _mismatch_pra_token(corpus):
+    pra_filepath = _get_pra_filepath(corpus)
+    pra_filepath.write_text(pra_filepath.read_text().replace('REF:  THE', 'REF:  A'))
+
+
+def _corrupt_pra(corpus):
+    _get_pra_filepath(corpus).write_bytes(b'id: \xff\xfe\x80\nREF:  \xff\n')
+
+
+def _cross_word_boundary(corpus):
+    # stretch the first word's last phone into the pause that follows it
+    tg_filepath = str(
+        Path(corpus['textgrid_inputs_dir_path']) / SPKR_TASK_ID / f"{SPKR_TASK_ID}.TextGrid"
+    )
+    tg = textgrid.openTextgrid(tg_filepath, includeEmptyIntervals=False)
+    phone_intervals = list(tg.getTier('phone').entries)
+    pause_idx = next(idx for idx, interval in enumerate(phone_intervals) if interval.label == 'sp')
+    last_phone, pause = phone_intervals[pause_idx - 1], phone_intervals[pause_idx]
+    boundary = (pause.start + pause.end) / 2
+    phone_intervals[pause_idx - 1] = Interval(last_phone.start, boundary, last_phone.label)
+    phone_intervals[pause_idx] = Interval(boundary, pause.end, pause.label)
+    tg.replaceTier('phone', tg.getTier('phone').new(entries=phone_intervals))
+    tg.save(tg_filepath, 'long_textgrid', includeBlankSpaces=True)
+
+
+def test_validate_clean_corpus(corpus, tmp_path):
+    exit_code, report = _validate(corpus, tmp_path / 'report.json')
+    assert exit_code == 0
+    assert report['num_invalid'] == 0
+    assert all(not spkr_task_report['issues'] for spkr_task_report in report['spkr_tasks'].values())
+
+
+@pytest.mark.parametrize('break_corpus, check', [
+    (_remove_wav, 'file-count'),
+    (_mismatch_pra_token, 'token-identity'),
+    (_corrupt_pra, 'pra'),
+    (_cross_word_boundary, 'phone-word-overlap'),
+])
+def test_validate_broken_corpus(corpus, tmp_path, break_corpus, check):
+    break_corpus(corpus)
+    exit_code, report = _validate(corpus, tmp_path / 'report.json')
+    assert exit_code == 1
+    assert report['num_invalid'] == 1
+    assert [issue['check'] for issue in report['spkr_tasks'][SPKR_TASK_ID]['issues']] == [check]